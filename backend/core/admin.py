@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Category, Product
+from django.utils import timezone
+from .models import Category, Job, Product
+from .search import search_products
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -11,4 +13,24 @@ class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'price', 'category', 'stock', 'is_featured')
     list_filter = ('category', 'is_featured')
     search_fields = ('name', 'description')
-    prepopulated_fields = {'slug': ('name',)}
\ No newline at end of file
+    prepopulated_fields = {'slug': ('name',)}
+
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index instead of LIKE '%term%' over search_fields
+        if not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+        return search_products(queryset, search_term), False
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_at', 'created_at', 'finished_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('attempts', 'locked_until', 'last_error', 'created_at', 'finished_at')
+    actions = ['retry']
+
+    @admin.action(description='Retry selected failed jobs now')
+    def retry(self, request, queryset):
+        # Pending and running jobs will run anyway; succeeded ones must not run twice
+        queryset.filter(status='failed').update(
+            status='pending', attempts=0, run_at=timezone.now(), finished_at=None,
+        )
@@ -0,0 +1,227 @@
+"""
+Daily analytics rollups.
+
+AdminAnalyticsView reads pre-aggregated rows (one per day, per day and
+status, per day and category) instead of scanning Order and User. The
+receivers below keep them current with F() increments as orders, items and
+users change; ``rebuild_rollups`` recomputes everything from history
+(``manage.py rebuild_analytics``).
+
+New orders and items are counted by jobs (core/jobs.py) rather than in the
+checkout request, so the rollups trail checkout by the worker's polling
+interval. Increments commute, so a status change or delete processed
+before its order's job still nets out.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .jobs import enqueue, job
+from .models import DailyCategoryRollup, DailyRollup, DailyStatusRollup, Job, Order, OrderItem
+
+
+def _increment(model, lookup, **deltas):
+    """Add ``deltas`` to the row matching ``lookup``, creating it if needed."""
+    if not any(deltas.values()):
+        return
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Another transaction created the row first
+        model.objects.filter(**lookup).update(**updates)
+
+
+def record_order_items(order, items, key):
+    """
+    Queue the per-category revenue of ``items``; called directly for items
+    written without signals (bulk_create). ``key`` identifies the items.
+    """
+    revenue = defaultdict(Decimal)
+    for item in items:
+        revenue[item.product.category_id] += item.price * item.quantity
+    enqueue('analytics.order_items', {
+        'day': timezone.localdate(order.created_at).isoformat(),
+        'revenue': {str(category_id): str(amount) for category_id, amount in revenue.items()},
+    }, key=key)
+
+
+@job('analytics.order_created')
+def rollup_order_created(day, revenue, status):
+    day = date.fromisoformat(day)
+    _increment(DailyRollup, {'date': day}, revenue=Decimal(revenue), order_count=1)
+    _increment(DailyStatusRollup, {'date': day, 'status': status}, count=1)
+
+
+@job('analytics.order_items')
+def rollup_order_items(day, revenue):
+    day = date.fromisoformat(day)
+    for category_id, amount in revenue.items():
+        _increment(DailyCategoryRollup, {'date': day, 'category_id': int(category_id)}, revenue=Decimal(amount))
+
+
+@receiver(post_init, sender=Order)
+def remember_order_state(sender, instance, **kwargs):
+    # Values as last loaded/saved, so updates and deletes can reverse them
+    instance._rollup_status = instance.__dict__.get('status')
+    instance._rollup_total = instance.__dict__.get('total_amount')
+
+
+@receiver(post_save, sender=Order)
+def rollup_order_saved(sender, instance, created, **kwargs):
+    day = timezone.localdate(instance.created_at)
+    if created:
+        # The values at creation: later changes are counted by the branch below
+        enqueue('analytics.order_created', {
+            'day': day.isoformat(), 'revenue': str(instance.total_amount), 'status': instance.status,
+        }, key=f'order-created:{instance.pk}')
+    else:
+        if instance._rollup_total is not None and instance.total_amount != instance._rollup_total:
+            _increment(DailyRollup, {'date': day}, revenue=Decimal(instance.total_amount) - instance._rollup_total)
+        if instance._rollup_status and instance.status != instance._rollup_status:
+            _increment(DailyStatusRollup, {'date': day, 'status': instance._rollup_status}, count=-1)
+            _increment(DailyStatusRollup, {'date': day, 'status': instance.status}, count=1)
+    instance._rollup_status = instance.status
+    instance._rollup_total = instance.total_amount
+
+
+@receiver(post_delete, sender=Order)
+def rollup_order_deleted(sender, instance, **kwargs):
+    day = timezone.localdate(instance.created_at)
+    _increment(DailyRollup, {'date': day}, revenue=-(instance._rollup_total or 0), order_count=-1)
+    _increment(DailyStatusRollup, {'date': day, 'status': instance._rollup_status or instance.status}, count=-1)
+
+
+@receiver(post_save, sender=OrderItem)
+def rollup_item_saved(sender, instance, created, **kwargs):
+    if created:
+        record_order_items(instance.order, [instance], key=f'order-item:{instance.pk}')
+
+
+@receiver(post_delete, sender=OrderItem)
+def rollup_item_deleted(sender, instance, **kwargs):
+    day = timezone.localdate(instance.order.created_at)
+    _increment(
+        DailyCategoryRollup, {'date': day, 'category_id': instance.product.category_id},
+        revenue=-(instance.price * instance.quantity),
+    )
+
+
+@receiver(post_save, sender=User)
+def rollup_user_saved(sender, instance, created, **kwargs):
+    if created:
+        _increment(DailyRollup, {'date': timezone.localdate(instance.date_joined)}, new_customers=1)
+
+
+@receiver(post_delete, sender=User)
+def rollup_user_deleted(sender, instance, **kwargs):
+    _increment(DailyRollup, {'date': timezone.localdate(instance.date_joined)}, new_customers=-1)
+
+
+def rebuild_rollups(batch_size=1000):
+    """
+    Recompute every rollup row from Order, OrderItem and User.
+
+    Orders and items are each read in one query, and only the analytics jobs
+    of the orders and items read are dropped. An order committed while this
+    runs keeps its job and is counted by it, rather than by neither.
+    """
+    tz = timezone.get_current_timezone()
+    days = defaultdict(lambda: {'revenue': Decimal(0), 'order_count': 0, 'new_customers': 0})
+    statuses = defaultdict(int)
+    categories = defaultdict(Decimal)
+    # Idempotency keys of the jobs whose work the rebuilt rows include
+    counted = set()
+
+    with transaction.atomic():
+        orders = Order.objects.order_by().annotate(day=TruncDate('created_at', tzinfo=tz))
+        order_ids = set()
+        for pk, day, status, total in orders.values_list('id', 'day', 'status', 'total_amount').iterator(batch_size):
+            order_ids.add(pk)
+            days[day]['revenue'] += total
+            days[day]['order_count'] += 1
+            statuses[day, status] += 1
+            counted.update((f'order-created:{pk}', f'order-items:{pk}'))
+
+        items = OrderItem.objects.order_by().annotate(day=TruncDate('order__created_at', tzinfo=tz)).values_list(
+            'id', 'order_id', 'day', 'product__category', 'price', 'quantity',
+        )
+        for pk, order_id, day, category_id, price, quantity in items.iterator(batch_size):
+            # Items of orders committed after the read above are left to their jobs
+            if order_id in order_ids:
+                categories[day, category_id] += price * quantity
+                counted.add(f'order-item:{pk}')
+
+        users = User.objects.order_by().annotate(day=TruncDate('date_joined', tzinfo=tz))
+        for row in users.values('day').annotate(count=Count('id')):
+            days[row['day']]['new_customers'] = row['count']
+
+        # A running job's worker finds its row gone and rolls its rollup
+        # update back (core.jobs.run_job)
+        unfinished = Job.objects.filter(name__startswith='analytics.', status__in=['pending', 'running', 'failed'])
+        stale = [pk for pk, key in unfinished.values_list('id', 'idempotency_key') if key in counted]
+        for offset in range(0, len(stale), batch_size):
+            Job.objects.filter(pk__in=stale[offset:offset + batch_size]).delete()
+
+        DailyRollup.objects.all().delete()
+        DailyStatusRollup.objects.all().delete()
+        DailyCategoryRollup.objects.all().delete()
+
+        DailyRollup.objects.bulk_create(
+            [DailyRollup(date=day, **values) for day, values in days.items()], batch_size=batch_size
+        )
+        DailyStatusRollup.objects.bulk_create(
+            [DailyStatusRollup(date=day, status=status, count=count) for (day, status), count in statuses.items()],
+            batch_size=batch_size,
+        )
+        DailyCategoryRollup.objects.bulk_create(
+            [DailyCategoryRollup(date=day, category_id=category_id, revenue=revenue)
+             for (day, category_id), revenue in categories.items()],
+            batch_size=batch_size,
+        )
+    return len(days)
+
+
+def analytics_summary(start=None, end=None):
+    """Totals, status/category breakdowns and a daily series for [start, end]."""
+    date_range = {}
+    if start:
+        date_range['date__gte'] = start
+    if end:
+        date_range['date__lte'] = end
+
+    series = list(
+        DailyRollup.objects.filter(**date_range)
+        .values('date', 'revenue', 'order_count', 'new_customers')
+    )
+    status_counts = {
+        status: total for status, total in
+        DailyStatusRollup.objects.filter(**date_range).order_by()
+        .values('status').annotate(total=Sum('count')).values_list('status', 'total')
+        if total
+    }
+    category_revenue = list(
+        DailyCategoryRollup.objects.filter(**date_range).order_by()
+        .values(category_name=F('category__name'), category_slug=F('category__slug'))
+        .annotate(revenue=Sum('revenue')).order_by('-revenue')
+    )
+
+    return {
+        'total_revenue': sum((day['revenue'] for day in series), Decimal(0)),
+        'total_orders': sum(day['order_count'] for day in series),
+        'total_customers': sum(day['new_customers'] for day in series),
+        'status_counts': status_counts,
+        'category_revenue': category_revenue,
+        'series': series,
+    }
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # Registers the analytics rollup, query observer, Prometheus counter
+        # and token revocation receivers
+        from . import analytics, authentication, metrics, prometheus  # noqa: F401
@@ -0,0 +1,134 @@
+"""
+Async versions of the read-heavy catalog and account endpoints, routed by
+nexus_api.asgi_urls when the app is served over ASGI (nexus_api/asgi.py).
+
+GET and HEAD run on the event loop with Django's async ORM and return the
+same JSON as the DRF views in core.views, sharing their catalog cache
+entries. Writes, and reads asking for the browsable API, are handed to the
+DRF view that nexus_api.urls routes the path to.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.db.models import Max
+from django.http import Http404, HttpResponse
+from django.shortcuts import aget_object_or_404
+from django.urls import resolve
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+
+from .authentication import StatelessJWTAuthentication
+from .cache import acached_entry, entry_headers
+from .filters import aproduct_facets
+from .models import Category, Product, Review
+from .pagination import CreatedAtCursorPagination, ProductCursorPagination
+from .renderers import FastJSONRenderer
+from .serializers import CategorySerializer, ProductSerializer, ReviewSerializer, UserSerializer
+from .views import catalog_products
+
+SYNC_URLCONF = 'nexus_api.urls'
+
+
+def json_response(data, status=200, headers=None):
+    return HttpResponse(
+        FastJSONRenderer().render(data), status=status, headers=headers, content_type='application/json',
+    )
+
+
+def wants_browsable_api(request):
+    return 'format' in request.GET or 'text/html' in request.headers.get('Accept', '')
+
+
+def async_read_view(view):
+    """
+    Serve GET/HEAD with ``view``, which receives a DRF Request (for
+    query_params) and returns an HttpResponse. API errors render like DRF's.
+    """
+    @csrf_exempt
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or wants_browsable_api(request):
+            match = resolve(request.path_info, urlconf=SYNC_URLCONF)
+            return await sync_to_async(match.func)(request, *match.args, **match.kwargs)
+        try:
+            return await view(Request(request), *args, **kwargs)
+        except (APIException, Http404) as exc:
+            if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+                exc.auth_header = StatelessJWTAuthentication().authenticate_header(request)
+            response = exception_handler(exc, {'request': request})
+            headers = {}
+            if response.has_header('WWW-Authenticate'):
+                headers['WWW-Authenticate'] = response['WWW-Authenticate']
+            return json_response(response.data, response.status_code, headers)
+    return wrapper
+
+
+def serializer_context(request):
+    return {'request': request, 'format': None, 'view': None}
+
+
+@async_read_view
+async def product_list(request):
+    queryset = catalog_products(request, Product.objects.defer('search_vector'), listing=True)
+
+    async def build():
+        paginator = ProductCursorPagination()
+        facets = await aproduct_facets(queryset)
+        page = await paginator.apaginate_queryset(queryset, request)
+        data = paginator.get_paginated_response(
+            ProductSerializer(page, many=True, context=serializer_context(request)).data
+        ).data
+        data['facets'] = facets
+        last_modified = (await queryset.aaggregate(Max('updated_at')))['updated_at__max']
+        return data, last_modified
+
+    entry = await acached_entry(request, build)
+    return json_response(entry['data'], headers=entry_headers(entry))
+
+
+@async_read_view
+async def product_detail(request, slug):
+    async def build():
+        queryset = catalog_products(request, Product.objects.defer('search_vector'), listing=False)
+        product = await aget_object_or_404(queryset, slug=slug)
+        return ProductSerializer(product, context=serializer_context(request)).data, product.updated_at
+
+    entry = await acached_entry(request, build)
+    return json_response(entry['data'], headers=entry_headers(entry))
+
+
+@async_read_view
+async def category_list(request):
+    async def build():
+        categories = [category async for category in Category.objects.all().aiterator()]
+        return CategorySerializer(categories, many=True, context=serializer_context(request)).data, None
+
+    entry = await acached_entry(request, build)
+    return json_response(entry['data'], headers=entry_headers(entry))
+
+
+@async_read_view
+async def review_list(request):
+    queryset = Review.objects.select_related('user__profile')
+    product_id = request.query_params.get('product')
+    if product_id:
+        queryset = queryset.filter(product_id=product_id)
+
+    paginator = CreatedAtCursorPagination()
+    page = await paginator.apaginate_queryset(queryset, request)
+    data = ReviewSerializer(page, many=True, context=serializer_context(request)).data
+    return json_response(paginator.get_paginated_response(data).data)
+
+
+@async_read_view
+async def current_user(request):
+    authenticated = await StatelessJWTAuthentication().aauthenticate(request)
+    if authenticated is None:
+        raise NotAuthenticated()
+    user = await User.objects.select_related('profile').filter(pk=authenticated[0].id).afirst()
+    if user is None:
+        return json_response({"detail": "User not found"}, status=404)
+    return json_response(UserSerializer(user).data)
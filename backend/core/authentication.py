@@ -0,0 +1,189 @@
+"""
+Stateless JWT authentication.
+
+Access tokens carry the claims authorization needs (user id, username,
+is_staff), so authenticating a request costs no query: request.user is a
+ClaimsUser built from the token, and views that need the full model load it
+themselves. Revocation rests on three things:
+
+- access tokens are short-lived (SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'])
+- refreshing reads the User row, refuses inactive accounts and revoked
+  refresh tokens, and re-issues the claims from the current row
+- deactivating a user, changing their password or staff status, or deleting
+  them moves their token version forward. Tokens carry the version current
+  when they were issued (the ``ver`` claim) and are rejected once it is
+  behind, so a login right after a change is unaffected.
+
+The version is stored on the user's Profile, which refreshing reads anyway,
+so a refresh token stays revoked for its whole lifetime. Access tokens are
+checked against a copy in the cache instead, to keep requests query-free;
+if that copy is culled or lives in a per-process cache (locmem) that other
+workers don't share, the access token lifetime bounds the gap.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import Profile
+
+# The claim holding the user's token version when the token was issued
+TOKEN_VERSION_CLAIM = 'ver'
+
+
+def token_version_key(user_id):
+    return f'auth:token-version:{user_id}'
+
+
+def revoke_user_tokens(user_id, store=True):
+    """
+    Reject every token issued to ``user_id`` so far. ``store=False`` only
+    updates the cache, for users whose profile is gone (deleted users, whose
+    refresh tokens fail anyway).
+    """
+    # Versions are nanosecond times rather than a counter, so the cached copy
+    # still moves forward if it was culled and is set again
+    version = time.time_ns()
+    if store:
+        Profile.objects.get_or_create(user_id=user_id)
+        Profile.objects.filter(user_id=user_id).update(token_version=version)
+    # Access tokens issued before the marker have expired by the time it does
+    timeout = settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'].total_seconds()
+    cache.set(token_version_key(user_id), version, timeout=timeout)
+    return version
+
+
+def stored_token_version(user):
+    profile = getattr(user, 'profile', None)
+    return profile.token_version if profile is not None else 0
+
+
+def is_behind(token, version):
+    # Tokens issued before versions were tracked have no claim
+    return version is not None and token.get(TOKEN_VERSION_CLAIM, 0) < version
+
+
+def is_revoked(token, user_id):
+    """Check an access token against the cached version."""
+    return is_behind(token, cache.get(token_version_key(user_id)))
+
+
+async def ais_revoked(token, user_id):
+    return is_behind(token, await cache.aget(token_version_key(user_id)))
+
+
+class ClaimsUser(TokenUser):
+    """The authenticated user as described by the access token's claims."""
+
+    def __str__(self):
+        return self.username
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        if is_revoked(validated_token, user.id):
+            raise AuthenticationFailed('Token has been revoked.', code='token_revoked')
+        return user
+
+    async def aauthenticate(self, request):
+        """authenticate() for the async views; reads the revocation marker without blocking."""
+        header = self.get_header(request)
+        raw_token = self.get_raw_token(header) if header is not None else None
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        user = super().get_user(validated_token)
+        if await ais_revoked(validated_token, user.id):
+            raise AuthenticationFailed('Token has been revoked.', code='token_revoked')
+        return user, validated_token
+
+
+def has_staff_token(request):
+    """
+    Whether ``request`` carries a valid access token with the is_staff claim.
+    No I/O, so middleware can call it on the event loop: the revocation
+    marker isn't read, so only use it for what a revoked token may still see
+    until it expires.
+    """
+    authentication = StatelessJWTAuthentication()
+    header = authentication.get_header(request)
+    try:
+        raw_token = authentication.get_raw_token(header) if header is not None else None
+        return raw_token is not None and bool(authentication.get_validated_token(raw_token).get('is_staff'))
+    except AuthenticationFailed:
+        return False
+
+
+def add_claims(token, user):
+    token['username'] = user.get_username()
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+    token[TOKEN_VERSION_CLAIM] = stored_token_version(user)
+    return token
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Add the claims ClaimsUser reads."""
+
+    @classmethod
+    def get_token(cls, user):
+        return add_claims(super().get_token(user), user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Issue an access token with claims read from the current User row."""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.select_related('profile').filter(pk=refresh.payload.get(api_settings.USER_ID_CLAIM)).first()
+        if (
+            user is None
+            or not api_settings.USER_AUTHENTICATION_RULE(user)
+            or is_behind(refresh, stored_token_version(user))
+        ):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        return {'access': str(add_claims(refresh.access_token, user))}
+
+
+def auth_state(user):
+    # Read loaded values only: touching a deferred field here would load it
+    # through a new instance, whose post_init would do the same
+    return tuple(user.__dict__.get(field) for field in ('is_active', 'password', 'is_staff'))
+
+
+def is_password_rehash(user, update_fields):
+    # check_password() upgrades an outdated hash on login with set_password()
+    # and then clears _password before save(update_fields=['password']); the
+    # password itself is unchanged. Explicit set_password() leaves _password
+    # set until save() has sent post_save.
+    return update_fields == {'password'} and user._password is None
+
+
+@receiver(post_init, sender=User)
+def remember_auth_state(sender, instance, **kwargs):
+    instance._auth_state = auth_state(instance)
+
+
+@receiver(post_save, sender=User)
+def revoke_on_auth_change(sender, instance, created, update_fields, **kwargs):
+    state = auth_state(instance)
+    if not created and state != instance._auth_state and not is_password_rehash(instance, update_fields):
+        version = revoke_user_tokens(instance.pk)
+        profile = User.profile.related.get_cached_value(instance, default=None)
+        if profile is not None:
+            profile.token_version = version
+    instance._auth_state = state
+
+
+@receiver(post_delete, sender=User)
+def revoke_on_delete(sender, instance, **kwargs):
+    revoke_user_tokens(instance.pk, store=False)
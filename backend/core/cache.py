@@ -0,0 +1,165 @@
+"""
+Versioned response cache for the public catalog endpoints.
+
+Cached entries are keyed by a catalog version plus the request's absolute
+URL: paginated bodies hold absolute next/previous links built from the
+request's scheme and Host, so one host's entry must not serve another. Any write
+to Product, Category or Review bumps the version (see the receivers in
+core/models.py), which orphans every cached entry at once instead of
+tracking which URLs a change affects. The same kind of counters back the
+ETags in core/conditional.py.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .prometheus import CATALOG_CACHE
+
+VERSION_KEY = 'catalog:version'
+# ETag counters (core/conditional.py): every order, or one user's with
+# order_version_key(user_id), and the product fields order items show
+ORDERS_VERSION_KEY = 'orders:version'
+PRODUCTS_VERSION_KEY = 'products:version'
+# Every user and profile, or one user's with user_scoped_key(); addresses and
+# saved items only per user
+USERS_VERSION_KEY = 'users:version'
+ADDRESSES_VERSION_KEY = 'addresses:version'
+SAVED_ITEMS_VERSION_KEY = 'saved-items:version'
+
+
+def get_versions(keys):
+    """The current value of each version counter in ``keys``, in order."""
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Seed from the clock so an evicted counter never reuses an old version
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def get_catalog_version():
+    return get_versions([VERSION_KEY])[0]
+
+
+async def aget_catalog_version():
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, time.time_ns(), timeout=None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def catalog_key(version, request):
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f'catalog:{version}:{url}'
+
+
+def make_entry(key, data, last_modified):
+    return {
+        'data': data,
+        'etag': '"%s"' % hashlib.md5(f'{key}:{last_modified}'.encode()).hexdigest(),
+        'last_modified': last_modified,
+    }
+
+
+def entry_headers(entry):
+    headers = {'ETag': entry['etag']}
+    if entry['last_modified'] is not None:
+        headers['Last-Modified'] = http_date(entry['last_modified'].timestamp())
+    return headers
+
+
+def _incr_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump_version(key):
+    """
+    Advance the version counter ``key``.
+
+    Bumps immediately and again once the surrounding transaction commits, so a
+    response cached (or ETag issued) by a concurrent request from pre-commit
+    data is invalidated too.
+    """
+    _incr_version(key)
+    transaction.on_commit(lambda: _incr_version(key))
+
+
+def bump_catalog_version():
+    """Invalidate cached catalog responses."""
+    bump_version(VERSION_KEY)
+
+
+def user_scoped_key(key, user_id):
+    """The counter for the part of ``key`` that belongs to ``user_id``."""
+    return f'{key}:{user_id}'
+
+
+def order_version_key(user_id):
+    return user_scoped_key(ORDERS_VERSION_KEY, user_id)
+
+
+def bump_order_version(user_id):
+    """Invalidate the ETags of order responses covering ``user_id``'s orders."""
+    bump_version(ORDERS_VERSION_KEY)
+    if user_id is not None:
+        bump_version(order_version_key(user_id))
+
+
+def bump_user_version(user_id):
+    """Invalidate the ETags of responses showing ``user_id``'s user or profile."""
+    bump_version(USERS_VERSION_KEY)
+    bump_version(user_scoped_key(USERS_VERSION_KEY, user_id))
+
+
+class CatalogCacheMixin:
+    """Serve list/retrieve from the catalog cache with ETag/Last-Modified headers."""
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
+    def get_last_modified(self):
+        """Return the newest modification time behind the current action, or None."""
+        return None
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        key = catalog_key(get_catalog_version(), request)
+        entry = cache.get(key)
+        CATALOG_CACHE.labels('miss' if entry is None else 'hit').inc()
+
+        if entry is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            entry = make_entry(key, response.data, self.get_last_modified())
+            cache.set(key, entry, settings.CATALOG_CACHE_TIMEOUT)
+
+        return Response(entry['data'], headers=entry_headers(entry))
+
+
+async def acached_entry(request, build):
+    """
+    The catalog cache entry for ``request`` from an async view, built from
+    ``await build()`` -> (data, last_modified) on a miss. Entries are shared
+    with CatalogCacheMixin.
+    """
+    key = catalog_key(await aget_catalog_version(), request)
+    entry = await cache.aget(key)
+    CATALOG_CACHE.labels('miss' if entry is None else 'hit').inc()
+
+    if entry is None:
+        entry = make_entry(key, *await build())
+        await cache.aset(key, entry, settings.CATALOG_CACHE_TIMEOUT)
+    return entry
@@ -0,0 +1,127 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Case, CharField, Count, Q, Value, When
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import Order
+
+# Price facet buckets in KSh: (label, lower bound inclusive, upper bound exclusive)
+PRICE_BUCKETS = (
+    ('0-10000', 0, 10000),
+    ('10000-50000', 10000, 50000),
+    ('50000-100000', 50000, 100000),
+    ('100000-200000', 100000, 200000),
+    ('200000+', 200000, None),
+)
+
+
+class ProductFilterSerializer(serializers.Serializer):
+    # Slug, or name in any case: storefront links use either
+    category = serializers.CharField(required=False)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, min_value=0)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, min_value=0)
+    is_featured = serializers.BooleanField(required=False, allow_null=True, default=None)
+    in_stock = serializers.BooleanField(required=False, allow_null=True, default=None)
+    min_rating = serializers.FloatField(required=False, min_value=0, max_value=5)
+
+
+class DateRangeSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if 'start' in data and 'end' in data and data['start'] > data['end']:
+            raise serializers.ValidationError("start must be on or before end.")
+        return data
+
+
+class OrderExportFilterSerializer(DateRangeSerializer):
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES, required=False)
+
+
+class CustomerExportFilterSerializer(DateRangeSerializer):
+    status = serializers.ChoiceField(choices=['active', 'inactive'], required=False)
+
+
+def date_range_filter(field, start=None, end=None):
+    """
+    Filter kwargs matching ``field`` datetimes on local days [start, end], as
+    index-friendly bounds rather than a __date lookup.
+    """
+    def start_of(day):
+        return timezone.make_aware(datetime.combine(day, time.min))
+
+    kwargs = {}
+    if start:
+        kwargs[f'{field}__gte'] = start_of(start)
+    if end:
+        kwargs[f'{field}__lt'] = start_of(end + timedelta(days=1))
+    return kwargs
+
+
+def filter_products(queryset, params):
+    """Apply the catalog filters in ``params`` (query string values) to ``queryset``."""
+    serializer = ProductFilterSerializer(data=params)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+
+    if 'category' in data:
+        queryset = queryset.filter(
+            Q(category__slug=data['category']) | Q(category__name__iexact=data['category'])
+        )
+    if 'min_price' in data:
+        queryset = queryset.filter(price__gte=data['min_price'])
+    if 'max_price' in data:
+        queryset = queryset.filter(price__lte=data['max_price'])
+    if data['is_featured'] is not None:
+        queryset = queryset.filter(is_featured=data['is_featured'])
+    if data['in_stock'] is not None:
+        queryset = queryset.filter(stock__gt=0) if data['in_stock'] else queryset.filter(stock__lte=0)
+    if 'min_rating' in data:
+        queryset = queryset.filter(rating_avg__gte=data['min_rating'])
+    return queryset
+
+
+def price_bucket_expression():
+    whens = []
+    for label, low, high in PRICE_BUCKETS:
+        condition = Q(price__gte=low)
+        if high is not None:
+            condition &= Q(price__lt=high)
+        whens.append(When(condition, then=Value(label)))
+    return Case(*whens, output_field=CharField())
+
+
+def facet_rows(queryset):
+    return (
+        queryset.order_by()
+        .annotate(price_bucket=price_bucket_expression())
+        .values('category__slug', 'category__name', 'price_bucket')
+        .annotate(count=Count('id'))
+    )
+
+
+def summarize_facets(rows):
+    categories = {}
+    price_buckets = {label: 0 for label, _, _ in PRICE_BUCKETS}
+    for row in rows:
+        slug = row['category__slug']
+        if slug not in categories:
+            categories[slug] = {'slug': slug, 'name': row['category__name'], 'count': 0}
+        categories[slug]['count'] += row['count']
+        price_buckets[row['price_bucket']] += row['count']
+
+    return {
+        'categories': sorted(categories.values(), key=lambda c: c['name']),
+        'price': [{'bucket': label, 'count': count} for label, count in price_buckets.items()],
+    }
+
+
+def product_facets(queryset):
+    """Category and price-bucket counts for ``queryset`` from one GROUP BY query."""
+    return summarize_facets(facet_rows(queryset))
+
+
+async def aproduct_facets(queryset):
+    return summarize_facets([row async for row in facet_rows(queryset)])
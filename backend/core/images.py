@@ -0,0 +1,136 @@
+"""
+Resized WebP and JPEG derivatives of product, category and avatar images.
+
+When an image field changes, a post_save receiver (core/models.py) renders
+the original at each of DERIVATIVE_WIDTHS narrower than itself, or once at
+its own width if it is narrower than all of them. The results go to the
+field's storage under keys derived from the original's name:
+
+    products/lamp.jpg -> derivatives/products/lamp-200w.webp, derivatives/products/lamp-200w.jpg, ...
+
+The model's ``<field>_derivatives`` column records the source name, widths
+and formats that were written, so serializers build srcset strings without
+asking the storage what exists. Images saved without save() (seed_data,
+QuerySet.update) get theirs from the build_image_derivatives command.
+"""
+import io
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+DERIVATIVE_WIDTHS = (200, 400, 800)
+# Format -> (Pillow format, file extension, save options)
+DERIVATIVE_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def derivative_name(source, width, derivative_format):
+    stem = os.path.splitext(source)[0]
+    return f'derivatives/{stem}-{width}w.{DERIVATIVE_FORMATS[derivative_format][1]}'
+
+
+def derivative_widths(original_width):
+    return [width for width in DERIVATIVE_WIDTHS if width < original_width] or [original_width]
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+
+
+def for_format(image, derivative_format):
+    """``image`` in a mode the format can save; JPEG gets transparency flattened onto white."""
+    if not has_alpha(image):
+        return image.convert('RGB')
+    image = image.convert('RGBA')
+    if derivative_format == 'webp':
+        return image
+    flattened = Image.new('RGB', image.size, 'white')
+    flattened.paste(image, mask=image.getchannel('A'))
+    return flattened
+
+
+def render(image, width, derivative_format):
+    if width < image.width:
+        height = max(1, round(image.height * width / image.width))
+        # reducing_gap: a fast box reduction first, then Lanczos on the small image
+        image = image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    pillow_format, _, options = DERIVATIVE_FORMATS[derivative_format]
+    output = io.BytesIO()
+    for_format(image, derivative_format).save(output, pillow_format, **options)
+    return output.getvalue()
+
+
+def write(storage, name, content):
+    # Storages rename rather than overwrite; the key has to stay as derived
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(content))
+
+
+def build_derivatives(field_file):
+    """Render and store the derivatives of ``field_file``; return the record for its ``_derivatives`` column."""
+    with field_file.open('rb') as source:
+        # exif_transpose returns a loaded copy, so the file can close
+        image = ImageOps.exif_transpose(Image.open(source))
+    widths = derivative_widths(image.width)
+    for width in widths:
+        for derivative_format in DERIVATIVE_FORMATS:
+            write(field_file.storage, derivative_name(field_file.name, width, derivative_format),
+                  render(image, width, derivative_format))
+    return {'source': field_file.name, 'widths': widths, 'formats': list(DERIVATIVE_FORMATS)}
+
+
+def refresh_derivatives(instance, field, update_fields=None, force=False):
+    """
+    Build derivatives for ``instance.<field>`` unless its ``<field>_derivatives``
+    record already covers that file (or ``force``), and store the record with
+    update(). Returns whether derivatives were built, or None if nothing was due.
+    """
+    if (update_fields is not None and field not in update_fields) or field in instance.get_deferred_fields():
+        return None
+    record_field = f'{field}_derivatives'
+    field_file, current = getattr(instance, field), getattr(instance, record_field)
+    if not field_file:
+        record = {}
+    elif current.get('source') == field_file.name and not force:
+        return None
+    else:
+        try:
+            record = build_derivatives(field_file)
+        except (OSError, Image.DecompressionBombError):
+            # Unreadable or missing original: it is served as is
+            record = {}
+    if record != current:
+        type(instance)._default_manager.filter(pk=instance.pk).update(**{record_field: record})
+        setattr(instance, record_field, record)
+    return bool(record) if field_file else None
+
+
+def srcset(field_file, record):
+    """
+    ``{format: "url 200w, url 400w"}`` for the derivatives in ``record``, or {}
+    when there are none for the field's current file.
+    """
+    if not field_file or not record or record.get('source') != field_file.name:
+        return {}
+    storage = field_file.storage
+    return {
+        derivative_format: ', '.join(
+            f"{storage.url(derivative_name(field_file.name, width, derivative_format))} {width}w"
+            for width in record['widths']
+        )
+        for derivative_format in record['formats']
+    }
+
+
+def rebuild_derivatives(queryset, field, force=False):
+    """refresh_derivatives() for each row of ``queryset`` with a file in ``field``; returns (built, failed) counts."""
+    built = failed = 0
+    for instance in queryset.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}).iterator():
+        result = refresh_derivatives(instance, field, force=force)
+        built += result is True
+        failed += result is False
+    return built, failed
@@ -0,0 +1,133 @@
+"""
+A database-backed job queue for side effects that shouldn't delay the
+request causing them, such as the analytics rollups of a new order.
+
+enqueue() inserts a Job row in the caller's transaction, so a job exists
+exactly when the work that caused it commits. ``manage.py run_jobs`` claims
+due jobs with a conditional UPDATE (safe with several workers, on SQLite
+too) and runs each handler in one transaction with marking its job done,
+which only commits while the worker's lease on the job holds: a handler's
+database writes happen once even if the worker dies or stalls mid-job.
+Anything a handler does outside the database (e.g. email) may repeat.
+
+A failing job is retried after RETRY_BASE_DELAY seconds, doubling per
+attempt up to RETRY_MAX_DELAY, until max_attempts; then it stays 'failed'
+with its traceback. Jobs of a worker that died are taken over when their
+JOB_LEASE expires.
+"""
+import random
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+JOB_LEASE = timedelta(minutes=5)
+RETRY_BASE_DELAY = 10
+RETRY_MAX_DELAY = 3600
+# Succeeded jobs older than this are deleted by the worker
+JOB_RETENTION = timedelta(days=7)
+
+# Job name -> handler, see job()
+HANDLERS = {}
+
+
+def job(name):
+    """Register the decorated function to run ``name`` jobs; it is called with the payload as keyword arguments."""
+    def register(handler):
+        HANDLERS[name] = handler
+        return handler
+    return register
+
+
+def enqueue(name, payload=None, key=None, delay=None, max_attempts=5):
+    """
+    Queue a ``name`` job, due now or after ``delay``. The payload must be
+    JSON-serializable. With an idempotency ``key``, enqueueing again while
+    a job with that key exists, in any state, does nothing.
+    """
+    if name not in HANDLERS:
+        raise ValueError(f"Unknown job '{name}'.")
+    Job.objects.bulk_create([Job(
+        name=name, payload=payload or {}, idempotency_key=key, max_attempts=max_attempts,
+        run_at=timezone.now() + (delay or timedelta()),
+    )], ignore_conflicts=True)
+
+
+def retry_delay(attempts):
+    delay = min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+    # Jitter, so jobs that failed together don't all retry together
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def due_jobs(now):
+    return Job.objects.filter(Q(status='pending', run_at__lte=now) | Q(status='running', locked_until__lt=now))
+
+
+def claim(limit):
+    """
+    Up to ``limit`` due jobs, oldest first, now marked running by this worker,
+    as (id, locked_until) pairs: the lease identifies this worker's claim.
+    """
+    now = timezone.now()
+    lease = now + JOB_LEASE
+    claimed = []
+    for pk in due_jobs(now).order_by('run_at', 'id').values_list('id', flat=True)[:limit]:
+        # No row updated: another worker claimed it after the SELECT
+        if due_jobs(now).filter(pk=pk).update(status='running', locked_until=lease, attempts=F('attempts') + 1):
+            claimed.append((pk, lease))
+    return claimed
+
+
+def run_job(pk, lease):
+    """Run a job claimed with ``lease``; return whether it succeeded."""
+    # Updates only while the claim is still ours. A job whose lease ran out
+    # may have been taken over by another worker, or deleted.
+    held = Job.objects.filter(pk=pk, status='running', locked_until=lease)
+    job = Job.objects.filter(pk=pk).first()
+    if job is None:
+        # Deleted since it was claimed (e.g. by rebuild_rollups)
+        return False
+    try:
+        if job.attempts > job.max_attempts:
+            # Claimed again each time its worker died before finishing it
+            raise RuntimeError('The job outlived its lease on every attempt.')
+        handler = HANDLERS.get(job.name)
+        if handler is None:
+            raise LookupError(f"No handler registered for '{job.name}'.")
+        with transaction.atomic():
+            handler(**job.payload)
+            if not held.update(status='succeeded', locked_until=None, finished_at=timezone.now(), last_error=''):
+                # Roll the handler's writes back; the job's new owner runs it
+                raise RuntimeError('The job was taken over or deleted while it ran.')
+        return True
+    except Exception:
+        now = timezone.now()
+        if job.attempts >= job.max_attempts:
+            changes = {'status': 'failed', 'finished_at': now}
+        else:
+            changes = {'status': 'pending', 'run_at': now + retry_delay(job.attempts)}
+        held.update(locked_until=None, last_error=traceback.format_exc(), **changes)
+        return False
+
+
+def run_batch(batch_size=20):
+    """Claim and run up to ``batch_size`` due jobs; return (succeeded, failed) counts."""
+    results = [run_job(pk, lease) for pk, lease in claim(batch_size)]
+    return results.count(True), results.count(False)
+
+
+def run_due_jobs(batch_size=20):
+    """Run jobs until none are due; return (succeeded, failed) counts."""
+    succeeded = failed = 0
+    while any(counts := run_batch(batch_size)):
+        succeeded += counts[0]
+        failed += counts[1]
+    return succeeded, failed
+
+
+def prune_jobs(older_than=JOB_RETENTION):
+    return Job.objects.filter(status='succeeded', finished_at__lt=timezone.now() - older_than).delete()[0]
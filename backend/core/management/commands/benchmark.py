@@ -0,0 +1,206 @@
+import json
+import statistics
+import subprocess
+import time
+from datetime import timedelta
+from io import StringIO
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.authentication import ClaimsTokenObtainPairSerializer
+from core.models import Category, Product, SavedItem
+
+# (name, method, path, client) for every route in core/urls.py. Path
+# placeholders are filled from Command.seed(); POST bodies come from Command.request_kwargs().
+ROUTES = [
+    ('product-list', 'GET', '/api/products/', 'anonymous'),
+    ('product-list-deep', 'GET', '/api/products/?page_size=100', 'anonymous'),
+    ('product-search', 'GET', '/api/products/?q=pro', 'anonymous'),
+    ('product-filter', 'GET', '/api/products/?category=audio&min_price=20000&in_stock=true', 'anonymous'),
+    ('product-detail', 'GET', '/api/products/{product}/', 'anonymous'),
+    ('category-list', 'GET', '/api/categories/', 'anonymous'),
+    ('category-detail', 'GET', '/api/categories/{category_id}/', 'anonymous'),
+    ('review-list', 'GET', '/api/reviews/', 'anonymous'),
+    ('order-list', 'GET', '/api/orders/', 'customer'),
+    ('order-detail', 'GET', '/api/orders/{order_id}/', 'customer'),
+    ('address-list', 'GET', '/api/addresses/', 'customer'),
+    ('saved-item-list', 'GET', '/api/saved-items/', 'customer'),
+    ('saved-item-batch', 'POST', '/api/saved-items/batch/', 'customer'),
+    ('current-user', 'GET', '/api/auth/users/me/', 'customer'),
+    ('purchased-products', 'GET', '/api/purchased-products/', 'customer'),
+    ('admin-customers', 'GET', '/api/admin/customers/', 'admin'),
+    ('admin-customer-detail', 'GET', '/api/admin/customers/{customer_id}/', 'admin'),
+    ('admin-customer-export', 'GET', '/api/admin/customers/export/?format=ndjson&start={month_ago}', 'admin'),
+    ('admin-orders', 'GET', '/api/admin/orders/', 'admin'),
+    ('admin-order-detail', 'GET', '/api/admin/orders/{order_id}/', 'admin'),
+    ('admin-order-export', 'GET', '/api/admin/orders/export/?format=csv&start={month_ago}', 'admin'),
+    ('admin-analytics', 'GET', '/api/admin/analytics/', 'admin'),
+    ('admin-metrics', 'GET', '/api/admin/metrics/', 'admin'),
+    ('admin-product-import', 'POST', '/api/admin/products/import/', 'admin'),
+]
+# Rows in the admin-product-import upload: price/stock updates of existing products
+IMPORT_ROWS = 1000
+
+
+def access_token(user):
+    # The login serializer's token: permissions read is_staff from its claims
+    return ClaimsTokenObtainPairSerializer.get_token(user).access_token
+
+
+def is_success(result):
+    return 200 <= result['status'] < 300
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks every API route (query count, p50/p95 latency, response bytes) '
+            'against seed_data catalogs in a throwaway test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Product counts to benchmark.')
+        parser.add_argument('--orders', type=int, default=100000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20, help='Samples per route.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--warm-cache', action='store_true',
+                            help='Keep the response cache between samples instead of clearing it.')
+        parser.add_argument('--output', default='benchmark.json')
+        parser.add_argument('--compare', help='Earlier results file to print deltas against.')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = []
+            for scale in options['scales']:
+                self.stdout.write(f'Seeding {scale} products, {options["orders"]} orders...')
+                clients = self.seed(scale, options['users'], options['orders'], options['seed'])
+                results.extend(self.run_routes(scale, clients, options['repeat'], options['warm_cache']))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {'meta': self.meta(options), 'results': results}
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(f'Wrote {len(results)} measurements to {options["output"]}')
+
+        if options['compare']:
+            self.compare(options['compare'], results)
+
+        failed = sorted({f'{result["route"]} ({result["status"]})' for result in results if not is_success(result)})
+        if failed:
+            raise CommandError(f'Routes did not return 2xx, so their timings measure an error: {", ".join(failed)}')
+        self.stdout.write(self.style.SUCCESS('All routes returned 2xx.'))
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+        except OSError:
+            commit = ''
+        return {
+            'commit': commit,
+            'timestamp': timezone.now().isoformat(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'warm_cache': options['warm_cache'],
+        }
+
+    def seed(self, products, users, orders, seed):
+        call_command('seed_data', products=products, users=users, orders=orders, seed=seed,
+                     stdout=StringIO())
+
+        # A customer with orders and saved items, so those routes serialize something
+        customer = SavedItem.objects.filter(user__orders__isnull=False).select_related('user').first().user
+        admin = User.objects.get(username='admin')
+        return {
+            'anonymous': Client(),
+            'customer': Client(HTTP_AUTHORIZATION=f'Bearer {access_token(customer)}'),
+            'admin': Client(HTTP_AUTHORIZATION=f'Bearer {access_token(admin)}'),
+            'product': Product.objects.order_by('id')[products // 2].slug,
+            'category_id': Category.objects.order_by('id').values_list('id', flat=True).first(),
+            'order_id': customer.orders.order_by('-created_at').values_list('id', flat=True).first(),
+            'customer_id': customer.id,
+            'month_ago': (timezone.localdate() - timedelta(days=30)).isoformat(),
+            'product_ids': list(Product.objects.order_by('id').values_list('id', flat=True)[:50]),
+            'import_rows': list(Product.objects.order_by('id').values_list('slug', 'price', 'stock')[:IMPORT_ROWS]),
+        }
+
+    def request_kwargs(self, name, fixtures):
+        """Body arguments for the POST routes; rebuilt per request, since an upload is consumed."""
+        if name == 'saved-item-batch':
+            return {'data': {'product_ids': fixtures['product_ids']}, 'content_type': 'application/json'}
+        if name == 'admin-product-import':
+            rows = ''.join(f'{slug},{price},{stock + 1}\n' for slug, price, stock in fixtures['import_rows'])
+            upload = SimpleUploadedFile('benchmark.csv', f'slug,price,stock\n{rows}'.encode(), 'text/csv')
+            return {'data': {'file': upload}}
+        return {}
+
+    def run_routes(self, scale, clients, repeat, warm_cache):
+        results = []
+        for name, method, path, client_name in ROUTES:
+            path = path.format(**clients)
+            client = clients[client_name]
+            timings, queries = [], []
+
+            for _ in range(repeat):
+                if not warm_cache:
+                    cache.clear()
+                kwargs = self.request_kwargs(name, clients)
+                # Seeding can fill the bounded query log, which breaks capture counts
+                reset_queries()
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = getattr(client, method.lower())(path, **kwargs)
+                    # Streamed exports do their work while being read
+                    content = b''.join(response.streaming_content) if response.streaming else response.content
+                    timings.append((time.perf_counter() - started) * 1000)
+                queries.append(len(captured.captured_queries))
+
+            result = {
+                'scale': scale,
+                'route': name,
+                'path': path,
+                'status': response.status_code,
+                'queries': max(queries),
+                'p50_ms': round(statistics.median(timings), 2),
+                'p95_ms': round(percentile(timings, 95), 2),
+                'bytes': len(content),
+            }
+            results.append(result)
+            line = (
+                f'{scale:>7} {name:<22} {result["status"]} q={result["queries"]:<3} '
+                f'p50={result["p50_ms"]:.1f}ms p95={result["p95_ms"]:.1f}ms {result["bytes"]}B'
+            )
+            self.stdout.write(line if is_success(result) else self.style.ERROR(f'{line}  <- not a 2xx, timings invalid'))
+        return results
+
+    def compare(self, path, results):
+        with open(path) as f:
+            baseline = {(r['scale'], r['route']): r for r in json.load(f)['results']}
+        self.stdout.write(f'\nDelta against {path}:')
+        for result in results:
+            before = baseline.get((result['scale'], result['route']))
+            if before is None or not is_success(before) or not is_success(result):
+                continue
+            self.stdout.write(
+                f'{result["scale"]:>7} {result["route"]:<20} '
+                f'queries {before["queries"]}->{result["queries"]} '
+                f'p50 {before["p50_ms"]:.1f}->{result["p50_ms"]:.1f}ms '
+                f'bytes {before["bytes"]}->{result["bytes"]}'
+            )
@@ -0,0 +1,91 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Category, Order, Product
+from core.renderers import FastJSONParser, FastJSONRenderer, orjson
+from core.serializers import ProductSerializer
+
+
+class Command(BaseCommand):
+    help = ('Compares DRF\'s JSONRenderer/JSONParser with core.renderers on product and '
+            'order payloads, checking the output is identical.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='Products and orders per payload.')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError('orjson is not installed; core.renderers falls back to the DRF classes.')
+        rng = random.Random(options['seed'])
+        payloads = {
+            'products': self.products(rng, options['rows']),
+            'orders': self.orders(rng, options['rows']),
+        }
+
+        for name, data in payloads.items():
+            baseline = JSONRenderer().render(data)
+            fast = FastJSONRenderer().render(data)
+            if fast != baseline:
+                raise CommandError(f'{name}: FastJSONRenderer output differs from JSONRenderer')
+
+            self.stdout.write(f'{name} ({options["rows"]} rows, {len(baseline) / 1024:.0f} KiB)')
+            for label, renderer, parser in (
+                ('drf', JSONRenderer(), JSONParser()),
+                ('orjson', FastJSONRenderer(), FastJSONParser()),
+            ):
+                render = self.time(lambda: renderer.render(data), options['repeat'])
+                parse = self.time(lambda: parser.parse(BytesIO(baseline)), options['repeat'])
+                self.stdout.write(f'  {label:<8} render {render:8.2f} ms   parse {parse:8.2f} ms')
+
+    def time(self, func, repeat):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
+
+    def products(self, rng, rows):
+        """A product list as ProductSerializer renders it (DecimalField values are strings)."""
+        category = Category(id=1, name='Audio', slug='audio')
+        now = timezone.now()
+        products = [
+            Product(
+                id=i, name=f'Product {i}', slug=f'product-{i}', description='Lorem ipsum ' * 20,
+                price=Decimal(rng.randint(500, 250000)) / 100, category=category, stock=rng.randint(0, 50),
+                image_url=f'https://example.com/{i}.jpg', rating_avg=rng.uniform(1, 5),
+                review_count=rng.randint(0, 300), created_at=now - timedelta(minutes=i), updated_at=now,
+            )
+            for i in range(rows)
+        ]
+        return ProductSerializer(products, many=True).data
+
+    def orders(self, rng, rows):
+        """Order-shaped dicts with raw Decimal and datetime values, as in analytics payloads."""
+        now = timezone.now()
+        statuses = [status for status, _ in Order.STATUS_CHOICES]
+        return [
+            {
+                'id': i,
+                'status': rng.choice(statuses),
+                'total_amount': Decimal(rng.randint(1000, 900000)) / 100,
+                'created_at': now - timedelta(seconds=i * 37),
+                'items': [
+                    {'product': rng.randint(1, rows), 'quantity': rng.randint(1, 4),
+                     'price': Decimal(rng.randint(500, 250000)) / 100}
+                    for _ in range(rng.randint(1, 4))
+                ],
+            }
+            for i in range(rows)
+        ]
@@ -0,0 +1,176 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Product
+
+from .benchmark import percentile
+
+# (name, gunicorn arguments) for the two deployments
+SERVERS = [
+    ('wsgi', ['nexus_api.wsgi']),
+    ('asgi', ['nexus_api.asgi', '-k', 'uvicorn_worker.UvicornWorker']),
+]
+
+# The endpoints nexus_api.asgi_urls serves from core.async_views; {product} is a product slug
+PATHS = [
+    '/api/products/',
+    '/api/products/{product}/',
+    '/api/categories/',
+    '/api/reviews/',
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response; return (status, keep_alive)."""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.read()
+        return status, False
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+async def client(port, paths, deadline, timings, errors, offset):
+    """One keep-alive connection issuing requests back to back until ``deadline``."""
+    reader = writer = None
+    index = offset
+    while time.perf_counter() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(
+                f'GET {path} HTTP/1.1\r\nHost: localhost\r\nAccept: application/json\r\n'
+                f'Accept-Encoding: gzip\r\n\r\n'.encode()
+            )
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+        except (OSError, asyncio.IncompleteReadError):
+            errors.append(path)
+            keep_alive = False
+        else:
+            timings.append((time.perf_counter() - started) * 1000)
+            if status >= 400:
+                errors.append(path)
+        if not keep_alive and writer is not None:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def slow_client(port, deadline):
+    """A client on a poor link: sends its request headers a few bytes at a time."""
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'GET /api/categories/ HTTP/1.1\r\nHost: localhost\r\n')
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(0.5)
+            writer.write(b'X-Padding: 1\r\n')
+            await writer.drain()
+        writer.close()
+    except OSError:
+        pass
+
+
+async def load(port, paths, connections, duration, slow_clients=0):
+    timings, errors = [], []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(
+        *(client(port, paths, deadline, timings, errors, offset) for offset in range(connections)),
+        *(slow_client(port, deadline) for _ in range(slow_clients)),
+    )
+    return timings, errors
+
+
+class Command(BaseCommand):
+    help = ('Compares request throughput of the WSGI (nexus_api.wsgi) and ASGI (nexus_api.asgi) '
+            'deployments under gunicorn as concurrent connections grow. Runs against the '
+            'configured database; seed it first (seed_data).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, nargs='+', default=[1, 16, 64, 256])
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per measurement.')
+        parser.add_argument('--workers', type=int, default=2, help='Gunicorn workers per server.')
+        parser.add_argument('--slow-clients', type=int, default=0,
+                            help='Extra connections that trickle their request headers in.')
+        parser.add_argument('--servers', nargs='+', choices=[name for name, _ in SERVERS],
+                            default=[name for name, _ in SERVERS])
+
+    def handle(self, *args, **options):
+        product = Product.objects.order_by('id').values_list('slug', flat=True).first()
+        if product is None:
+            raise CommandError('No products in the database; run seed_data first.')
+        paths = [path.format(product=product) for path in PATHS]
+
+        for name, app in SERVERS:
+            if name not in options['servers']:
+                continue
+            port = free_port()
+            server = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', *app, '--bind', f'127.0.0.1:{port}',
+                 '--workers', str(options['workers']), '--log-level', 'warning'],
+                cwd=settings.BASE_DIR, env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'nexus_api.settings'},
+            )
+            try:
+                self.wait_for(port, server)
+                asyncio.run(load(port, paths, 4, 2))  # warm-up
+                for connections in options['connections']:
+                    timings, errors = asyncio.run(load(
+                        port, paths, connections, options['duration'], options['slow_clients'],
+                    ))
+                    self.report(name, connections, options['duration'], timings, errors)
+            finally:
+                server.terminate()
+                server.wait()
+
+    def wait_for(self, port, server):
+        for _ in range(100):
+            if server.poll() is not None:
+                raise CommandError(f'gunicorn exited with status {server.returncode}')
+            try:
+                with socket.create_connection(('127.0.0.1', port), timeout=0.1):
+                    return
+            except OSError:
+                time.sleep(0.1)
+        raise CommandError(f'gunicorn did not start listening on port {port}')
+
+    def report(self, name, connections, duration, timings, errors):
+        if not timings:
+            self.stdout.write(f'{name:<5} c={connections:<4} no completed requests ({len(errors)} errors)')
+            return
+        self.stdout.write(
+            f'{name:<5} c={connections:<4} {len(timings) / duration:8.1f} req/s '
+            f'p50={percentile(timings, 50):7.1f}ms p95={percentile(timings, 95):7.1f}ms '
+            f'errors={len(errors)}'
+        )
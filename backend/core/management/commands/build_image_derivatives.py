@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core.images import DERIVATIVE_WIDTHS, rebuild_derivatives
+from core.models import Category, Product, Profile
+
+# (model, image field) pairs with derivatives
+IMAGE_FIELDS = [(Product, 'image'), (Category, 'image'), (Profile, 'avatar')]
+
+
+class Command(BaseCommand):
+    help = ('Builds the resized WebP/JPEG copies of product, category and avatar images that are '
+            'missing them, e.g. images set by seed_data or uploaded before derivatives existed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Rebuild every derivative, e.g. after changing DERIVATIVE_WIDTHS.')
+
+    def handle(self, *args, **options):
+        widths = ', '.join(f'{width}px' for width in DERIVATIVE_WIDTHS)
+        for model, field in IMAGE_FIELDS:
+            built, failed = rebuild_derivatives(model.objects.all(), field, force=options['force'])
+            self.stdout.write(f'{model._meta.verbose_name_plural}: built {built} ({widths})')
+            if failed:
+                self.stdout.write(self.style.WARNING(f'  {failed} images could not be read and are served as is.'))
+        self.stdout.write(self.style.SUCCESS('Image derivatives are up to date.'))
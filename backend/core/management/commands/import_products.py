@@ -0,0 +1,31 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.product_import import IMPORT_CHUNK_SIZE, ProductImport, format_for, open_text, read_rows
+
+
+class Command(BaseCommand):
+    help = ('Upserts products by slug from a CSV or JSON Lines file, in chunks, reporting '
+            'rows that could not be imported.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', dest='import_format', choices=['csv', 'jsonl'],
+                            help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        import_format = options['import_format'] or format_for(path)
+        if import_format is None:
+            raise CommandError(f'Cannot tell the format of {os.path.basename(path)}; pass --format.')
+
+        with open(path, 'rb') as f:
+            report = ProductImport(options['chunk_size']).run(read_rows(open_text(f), import_format))
+
+        for error in report['errors']:
+            self.stderr.write(f"line {error['line']} ({error['slug'] or 'no slug'}): {error['errors']}")
+        summary = (f"{report['created']} created, {report['updated']} updated, "
+                   f"{report['unchanged']} unchanged, {len(report['errors'])} rejected")
+        self.stdout.write(self.style.SUCCESS(summary) if not report['errors'] else self.style.WARNING(summary))
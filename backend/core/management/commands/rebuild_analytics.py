@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from core.analytics import rebuild_rollups
+
+class Command(BaseCommand):
+    help = 'Rebuilds the daily analytics rollups from order and user history.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        days = rebuild_rollups(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt analytics rollups for {days} days.'))
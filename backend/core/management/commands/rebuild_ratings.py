@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+from core.cache import PRODUCTS_VERSION_KEY, bump_catalog_version, bump_version
+from core.models import Product
+
+class Command(BaseCommand):
+    help = 'Rebuilds the denormalized Product.rating_avg and Product.review_count from reviews.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Width of the product id range updated per statement.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        bounds = Product.objects.aggregate(lo=Min('id'), hi=Max('id'))
+        updated = 0
+
+        if bounds['lo'] is not None:
+            for start in range(bounds['lo'], bounds['hi'] + 1, batch_size):
+                with transaction.atomic():
+                    updated += Product.objects.filter(
+                        id__gte=start, id__lt=start + batch_size
+                    ).refresh_ratings()
+
+        # update() sends no post_save, so invalidate cached catalog responses
+        # and product ETags as a save would
+        bump_catalog_version()
+        bump_version(PRODUCTS_VERSION_KEY)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt ratings for {updated} products.'))
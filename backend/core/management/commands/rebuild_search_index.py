@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.models import Product
+from core.search import rebuild_search_index
+
+class Command(BaseCommand):
+    help = 'Rebuilds the product full-text search index (after bulk loads that skip signals).'
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            rebuild_search_index(Product)
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
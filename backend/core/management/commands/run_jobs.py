@@ -0,0 +1,52 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.jobs import prune_jobs, run_batch, run_due_jobs
+
+PRUNE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = ('Runs queued background jobs (core/jobs.py), polling the database for due ones. '
+            'Several workers can run at once.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the jobs that are due, then exit.')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to wait before polling again when no job is due.')
+        parser.add_argument('--batch-size', type=int, default=20, help='Jobs claimed per poll.')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            self.report(*run_due_jobs(options['batch_size']))
+            return
+
+        self.stopping = False
+        # Finish the current batch on SIGTERM (e.g. a deploy) rather than
+        # leaving it to wait out its lease
+        signal.signal(signal.SIGTERM, self.stop)
+        self.stdout.write(f"Running jobs every {options['interval']}s; Ctrl+C to stop.")
+        pruned_at = 0
+        try:
+            while not self.stopping:
+                close_old_connections()
+                succeeded, failed = run_batch(options['batch_size'])
+                if succeeded or failed:
+                    self.report(succeeded, failed)
+                    continue
+                if time.monotonic() - pruned_at > PRUNE_INTERVAL:
+                    prune_jobs()
+                    pruned_at = time.monotonic()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def report(self, succeeded, failed):
+        message = f'{succeeded} jobs succeeded, {failed} failed.'
+        self.stdout.write(self.style.WARNING(message) if failed else message)
@@ -1,149 +1,300 @@
 import os
 import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
 from django.core.management.base import BaseCommand
-from django.core.files import File
 from django.conf import settings
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from core.models import Product, Order, OrderItem, Address, Category, SavedItem, Review
+from django.db import connection, transaction
 from django.utils import timezone
+from django.utils.text import slugify
+from faker import Faker
+from core.analytics import rebuild_rollups
+from core.cache import bump_catalog_version
+from core.images import rebuild_derivatives
+from core.models import (
+    Product, Order, OrderItem, Address, Category, SavedItem, Review, Profile,
+    DailyRollup, DailyStatusRollup, DailyCategoryRollup
+)
+from core.search import rebuild_search_index
+from core.serializers import TAX_RATE, SHIPPING_FEES, DEFAULT_SHIPPING_FEE
+
+# Curated catalog (Name, Price, Category, Filename)
+PRODUCTS = [
+    ("AirPods Max", 85000, "Audio", "airpods_max.jpg"),
+    ("Apple Watch Ultra", 120000, "Watches", "apple-watch-ultra.jpg"),
+    ("Asus ROG Zephyrus", 250000, "Laptops", "asus-rog-zephyrus.jpg"),
+    ("Bose QC 45", 45000, "Audio", "bose-qc-45.jpg"),
+    ("Canon Camera", 150000, "Accessories", "canon_camera.jpg"),
+    ("Dell XPS 15", 210000, "Laptops", "dell_xps_15.jpg"),
+    ("DJI Mini Drone", 85000, "Accessories", "drone_mini.jpg"),
+    ("Galaxy Watch 6", 45000, "Watches", "galaxy-watch-6.jpg"),
+    ("Gaming Keyboard", 15000, "Gaming", "gaming_keyboard.jpg"),
+    ("Gaming Mouse", 8000, "Gaming", "gaming_mouse.jpg"),
+    ("Garmin Fenix 7", 95000, "Watches", "garmin-fenix-7.jpg"),
+    ("Google Pixel 8", 110000, "Phones", "google_pixel_8.jpg"),
+    ("HP Spectre x360", 185000, "Laptops", "hp-spectre-x360.jpg"),
+    ("iPhone 15 Pro", 180000, "Phones", "iphone_15_pro.jpg"),
+    ("JBL Flip 6", 12000, "Audio", "jbl-flip-6.jpg"),
+    ("Keychron K2", 18000, "Gaming", "keychron-k2-keyboard.jpg"),
+    ("Logitech MX Master", 14000, "Accessories", "logitech-mx-master.jpg"),
+    ("MacBook Pro 16", 320000, "Laptops", "macbook_pro_16.jpg"),
+    ("Marshall Major IV", 22000, "Audio", "marshall-major-iv.jpg"),
+    ("Marshall Speaker", 35000, "Audio", "marshall_speaker.jpg"),
+    ("Mechanical Watch", 45000, "Watches", "mechanical_watch.jpg"),
+    ("Nintendo Switch OLED", 45000, "Gaming", "nintendo-switch-oled.jpg"),
+    ("OnePlus 12", 120000, "Phones", "oneplus-12.jpg"),
+    ("PS5 Slim", 75000, "Gaming", "ps5-slim.jpg"),
+    ("PS5 Controller", 12000, "Gaming", "ps5_controller.jpg"),
+    ("Samsung S24 Ultra", 195000, "Phones", "samsung_s24_ultra.jpg"),
+    ("Sony WH-1000XM5", 45000, "Audio", "sony_wh-1000xm5.jpg"),
+    ("Xiaomi 14", 105000, "Phones", "xiaomi-14.jpg"),
+]
+
+# Synthetic catalog: price range (KSh) and brands per category
+CATEGORIES = {
+    'Laptops': ((60000, 350000), ['Dell', 'HP', 'Lenovo', 'Asus', 'Acer', 'Apple']),
+    'Audio': ((3000, 90000), ['Sony', 'Bose', 'JBL', 'Marshall', 'Sennheiser', 'Anker']),
+    'Phones': ((12000, 200000), ['Samsung', 'Tecno', 'Infinix', 'Xiaomi', 'Oppo', 'Apple']),
+    'Gaming': ((4000, 90000), ['Razer', 'Logitech', 'Sony', 'Nintendo', 'HyperX', 'Corsair']),
+    'Accessories': ((1000, 150000), ['Anker', 'Belkin', 'Canon', 'DJI', 'Ugreen', 'Oraimo']),
+    'Watches': ((5000, 130000), ['Garmin', 'Casio', 'Samsung', 'Apple', 'Huawei', 'Amazfit']),
+}
+
+PERSONAS = [
+    ("alice", "Alice Admin"), ("bob", "Bob Builder"), ("charlie", "Charlie Chef"),
+    ("diana", "Diana Doc"), ("eddie", "Eddie Eng"), ("fiona", "Fiona Fit"),
+    ("greg", "Greg Gamer"), ("hannah", "Hannah HR"), ("ian", "Ian IT"),
+    ("jane", "Jane Journo"), ("kevin", "Kevin King"), ("lisa", "Lisa Law"),
+    ("mike", "Mike Mech"), ("nina", "Nina Nurse"), ("oscar", "Oscar Ops")
+]
+
+CITIES = ['Nairobi', 'Mombasa', 'Kisumu', 'Nakuru', 'Eldoret', 'Thika', 'Nyeri', 'Machakos']
+STATUS_WEIGHTS = {'delivered': 60, 'shipped': 12, 'processing': 10, 'pending': 10, 'cancelled': 8}
+COMMENTS = ["Excellent!", "Love it.", "Good value.", "Works as described.", "Fast delivery.",
+            "Decent for the price.", "Not what I expected."]
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create keep the created_at/date values we generate instead of now()."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now_add in saved:
+            field.auto_now_add = auto_now_add
+
 
 class Command(BaseCommand):
-    help = 'Seeds database. Uses local images if available, otherwise creates products without images.'
+    help = ('Seeds the database with the curated catalog and personas, plus Faker-generated '
+            'products, users and orders inserted with batched bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=len(PRODUCTS),
+                            help='Total products (the curated catalog is always included).')
+        parser.add_argument('--users', type=int, default=len(PERSONAS),
+                            help='Total customers (the personas are always included).')
+        parser.add_argument('--orders', type=int, default=30, help='Total orders.')
+        parser.add_argument('--seed', type=int, default=2026, help='Random seed for reproducible data.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        Faker.seed(options['seed'])
+        fake = Faker()
+        self.batch_size = options['batch_size']
+
+        # Faker is slow per call; draw rows from pre-generated pools instead
+        self.words = [fake.word().title() for _ in range(500)]
+        self.paragraphs = [fake.paragraph(nb_sentences=3) for _ in range(500)]
+        self.streets = [fake.street_name() for _ in range(500)]
+        self.first_names = [fake.first_name() for _ in range(500)]
+        self.last_names = [fake.last_name() for _ in range(500)]
 
-    def handle(self, *args, **kwargs):
         self.stdout.write('Starting Database Seed...')
 
-        # 1. Cleanup
-        User.objects.exclude(is_superuser=True).delete()
-        Product.objects.all().delete()
-        Category.objects.all().delete()
-        Review.objects.all().delete()
-        Order.objects.all().delete()
-
-        # 2. Categories
-        categories_data = ['Laptops', 'Audio', 'Phones', 'Gaming', 'Accessories', 'Watches']
-        categories = {}
-        for name in categories_data:
-            cat = Category.objects.create(name=name)
-            categories[name] = cat
-
-        # 3. Products Mapping (Name, Price, Category, Filename)
-        products_list = [
-            ("AirPods Max", 85000, "Audio", "airpods_max.jpg"),
-            ("Apple Watch Ultra", 120000, "Watches", "apple-watch-ultra.jpg"),
-            ("Asus ROG Zephyrus", 250000, "Laptops", "asus-rog-zephyrus.jpg"),
-            ("Bose QC 45", 45000, "Audio", "bose-qc-45.jpg"),
-            ("Canon Camera", 150000, "Accessories", "canon_camera.jpg"),
-            ("Dell XPS 15", 210000, "Laptops", "dell_xps_15.jpg"),
-            ("DJI Mini Drone", 85000, "Accessories", "drone_mini.jpg"),
-            ("Galaxy Watch 6", 45000, "Watches", "galaxy-watch-6.jpg"),
-            ("Gaming Keyboard", 15000, "Gaming", "gaming_keyboard.jpg"),
-            ("Gaming Mouse", 8000, "Gaming", "gaming_mouse.jpg"),
-            ("Garmin Fenix 7", 95000, "Watches", "garmin-fenix-7.jpg"),
-            ("Google Pixel 8", 110000, "Phones", "google_pixel_8.jpg"),
-            ("HP Spectre x360", 185000, "Laptops", "hp-spectre-x360.jpg"),
-            ("iPhone 15 Pro", 180000, "Phones", "iphone_15_pro.jpg"),
-            ("JBL Flip 6", 12000, "Audio", "jbl-flip-6.jpg"),
-            ("Keychron K2", 18000, "Gaming", "keychron-k2-keyboard.jpg"),
-            ("Logitech MX Master", 14000, "Accessories", "logitech-mx-master.jpg"),
-            ("MacBook Pro 16", 320000, "Laptops", "macbook_pro_16.jpg"),
-            ("Marshall Major IV", 22000, "Audio", "marshall-major-iv.jpg"),
-            ("Marshall Speaker", 35000, "Audio", "marshall_speaker.jpg"),
-            ("Mechanical Watch", 45000, "Watches", "mechanical_watch.jpg"),
-            ("Nintendo Switch OLED", 45000, "Gaming", "nintendo-switch-oled.jpg"),
-            ("OnePlus 12", 120000, "Phones", "oneplus-12.jpg"),
-            ("PS5 Slim", 75000, "Gaming", "ps5-slim.jpg"),
-            ("PS5 Controller", 12000, "Gaming", "ps5_controller.jpg"),
-            ("Samsung S24 Ultra", 195000, "Phones", "samsung_s24_ultra.jpg"),
-            ("Sony WH-1000XM5", 45000, "Audio", "sony_wh-1000xm5.jpg"),
-            ("Xiaomi 14", 105000, "Phones", "xiaomi-14.jpg"),
-        ]
+        with transaction.atomic():
+            self.clear()
+            categories = self.create_categories()
+            products = self.create_products(categories, options['products'])
+            users = self.create_users(options['users'])
+            self.create_orders(users, products, options['orders'])
+            self.create_saved_items(users, products)
+
+            if not User.objects.filter(username='admin').exists():
+                User.objects.create_superuser('admin', 'admin@nova.com', 'admin123')
+
+            # bulk_create skips the signals that maintain these
+            self.stdout.write('Rebuilding ratings, search index, image derivatives and analytics...')
+            Product.objects.refresh_ratings()
+            rebuild_search_index(Product)
+            rebuild_derivatives(Product.objects.all(), 'image')
+            rebuild_rollups(batch_size=self.batch_size)
+            bump_catalog_version()
+
+        self.stdout.write(self.style.SUCCESS('Seeding Complete!'))
+
+    def clear(self):
+        # Plain DELETEs: the ORM collector would fetch every row and fire per-row signals.
+        # Superusers and their profiles/addresses are kept.
+        tables = [model._meta.db_table for model in (
+            OrderItem, Order, Review, SavedItem, Product, Category,
+            DailyRollup, DailyStatusRollup, DailyCategoryRollup,
+        )]
+        customers = f'SELECT id FROM {User._meta.db_table} WHERE NOT is_superuser'
+        with connection.cursor() as cursor:
+            for table in tables:
+                cursor.execute(f'DELETE FROM {table}')
+            for model in (Address, Profile, LogEntry, User.groups.through, User.user_permissions.through):
+                cursor.execute(f'DELETE FROM {model._meta.db_table} WHERE user_id IN ({customers})')
+            cursor.execute(f'DELETE FROM {User._meta.db_table} WHERE NOT is_superuser')
 
-        db_products = []
+    def create_categories(self):
+        categories = Category.objects.bulk_create([
+            Category(name=name, slug=slugify(name)) for name in CATEGORIES
+        ])
+        return {category.name: category for category in categories}
 
-        for name, price, cat_name, filename in products_list:
-            file_path = os.path.join(settings.MEDIA_ROOT, 'products', filename)
-            
-            prod = Product(
+    def create_products(self, categories, total):
+        products = []
+        for name, price, cat_name, filename in PRODUCTS:
+            product = Product(
                 name=name,
+                slug=slugify(name),
                 description=f"Authentic {name}. Premium build quality. Includes 1 year warranty.",
                 price=price,
                 category=categories.get(cat_name, categories['Accessories']),
-                stock=random.randint(5, 50),
-                is_featured=random.choice([True, False])
+                stock=self.rng.randint(5, 50),
+                is_featured=self.rng.choice([True, False])
             )
-
-            # Check if file exists to attach it, but DON'T skip product creation if missing
-            if os.path.exists(file_path):
-                with open(file_path, 'rb') as f:
-                    prod.image.save(filename, File(f), save=False)
+            # Point at the bundled image rather than copying it into a new file
+            if os.path.exists(os.path.join(settings.MEDIA_ROOT, 'products', filename)):
+                product.image.name = f'products/{filename}'
             else:
                 self.stdout.write(self.style.WARNING(f"Image missing for {name}, creating without image file."))
+            products.append(product)
+
+        names = list(CATEGORIES)
+        for i in range(total - len(PRODUCTS)):
+            cat_name = names[i % len(names)]
+            (low, high), brands = CATEGORIES[cat_name]
+            name = f"{self.rng.choice(brands)} {self.rng.choice(self.words)} {self.rng.randint(2, 99)}"
+            products.append(Product(
+                name=name,
+                slug=f"{slugify(name)}-{i}",
+                description=self.rng.choice(self.paragraphs),
+                price=Decimal(self.rng.randrange(low, high, 50)),
+                category=categories[cat_name],
+                stock=self.rng.choice([0, self.rng.randint(1, 200)]),
+                is_featured=self.rng.random() < 0.05,
+            ))
+
+        products = Product.objects.bulk_create(products, batch_size=self.batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Created {len(products)} products"))
+        return [(product.id, product.price) for product in products]
+
+    def create_users(self, total):
+        # One PBKDF2 hash shared by every seeded account (password123)
+        password = make_password('password123')
+        now = timezone.now()
 
-            prod.save()
-            db_products.append(prod)
-            self.stdout.write(self.style.SUCCESS(f"Created: {name}"))
-
-        # 4. Create Users (15 Personas)
-        personas = [
-            ("alice", "Alice Admin"), ("bob", "Bob Builder"), ("charlie", "Charlie Chef"),
-            ("diana", "Diana Doc"), ("eddie", "Eddie Eng"), ("fiona", "Fiona Fit"),
-            ("greg", "Greg Gamer"), ("hannah", "Hannah HR"), ("ian", "Ian IT"),
-            ("jane", "Jane Journo"), ("kevin", "Kevin King"), ("lisa", "Lisa Law"),
-            ("mike", "Mike Mech"), ("nina", "Nina Nurse"), ("oscar", "Oscar Ops")
+        accounts = [(username, *fullname.split(' ')) for username, fullname in PERSONAS]
+        accounts += [
+            (f"user{i}", self.rng.choice(self.first_names), self.rng.choice(self.last_names))
+            for i in range(total - len(PERSONAS))
         ]
 
-        for username, fullname in personas:
-            if User.objects.filter(username=username).exists():
-                continue
-
-            fname, lname = fullname.split(' ')
-            user = User.objects.create_user(
-                username=username,
-                email=f"{username}@nova.com",
-                password='password123',
-                first_name=fname,
-                last_name=lname
-            )
+        user_ids = []
+        for start in range(0, len(accounts), self.batch_size):
+            batch = User.objects.bulk_create([
+                User(
+                    username=username,
+                    email=f"{username}@nova.com",
+                    password=password,
+                    first_name=first,
+                    last_name=last,
+                    date_joined=now - timedelta(days=self.rng.randint(30, 730)),
+                )
+                for username, first, last in accounts[start:start + self.batch_size]
+            ])
+            Profile.objects.bulk_create([Profile(user=user) for user in batch])
+            Address.objects.bulk_create([
+                Address(
+                    user=user,
+                    full_name=f"{user.first_name} {user.last_name}",
+                    label="home",
+                    street=f"{self.rng.randint(1, 300)} {self.rng.choice(self.streets)}",
+                    city=self.rng.choice(CITIES),
+                    postal_code="00100",
+                    country="Kenya",
+                    phone=f"+2547{self.rng.randint(10000000, 99999999)}",
+                    is_default=True,
+                )
+                for user in batch
+            ])
+            user_ids.extend(user.id for user in batch)
 
-            Address.objects.create(
-                user=user,
-                full_name=fullname,
-                label="home",
-                street=f"{random.randint(1,100)} Moi Avenue",
-                city="Nairobi",
-                postal_code="00100",
-                country="Kenya",
-                phone=f"+2547{random.randint(10000000, 99999999)}",
-                is_default=True
-            )
+        self.stdout.write(self.style.SUCCESS(f"Created {len(user_ids)} users"))
+        return user_ids
 
-            if db_products:
-                for _ in range(random.randint(1, 3)):
-                    order_items = random.sample(db_products, k=random.randint(1, 2))
-                    total = sum([float(p.price) for p in order_items])
-
-                    order = Order.objects.create(
-                        user=user,
-                        status='delivered',
-                        total_amount=total,
-                        shipping_address="Nairobi",
-                        payment_method="mpesa",
-                        created_at=timezone.now() - timezone.timedelta(days=random.randint(1, 60))
-                    )
-
-                    for item in order_items:
-                        OrderItem.objects.create(order=order, product=item, quantity=1, price=item.price)
-
-                        if random.choice([True, False]):
-                            Review.objects.create(
-                                user=user,
-                                product=item,
-                                rating=random.randint(4, 5),
-                                comment=random.choice(["Excellent!", "Love it.", "Good value."])
-                            )
-
-        if not User.objects.filter(username='admin').exists():
-            User.objects.create_superuser('admin', 'admin@nova.com', 'admin123')
+    def create_orders(self, users, products, total):
+        if not users or not products:
+            return
+        statuses = list(STATUS_WEIGHTS)
+        weights = list(STATUS_WEIGHTS.values())
+        now = timezone.now()
+        created = 0
 
-        self.stdout.write(self.style.SUCCESS('Seeding Complete!'))
+        with explicit_timestamps(Order._meta.get_field('created_at'), Review._meta.get_field('created_at')):
+            while created < total:
+                count = min(self.batch_size, total - created)
+                orders, order_items = [], []
+                for _ in range(count):
+                    picked = self.rng.sample(products, k=min(len(products), self.rng.randint(1, 3)))
+                    quantities = [self.rng.choice([1, 1, 1, 2]) for _ in picked]
+                    subtotal = sum(price * qty for (_, price), qty in zip(picked, quantities))
+                    city = self.rng.choice(CITIES)
+                    total_amount = subtotal + subtotal * TAX_RATE + SHIPPING_FEES.get(city, DEFAULT_SHIPPING_FEE)
+                    orders.append(Order(
+                        user_id=self.rng.choice(users),
+                        status=self.rng.choices(statuses, weights)[0],
+                        total_amount=total_amount.quantize(Decimal('0.01')),
+                        shipping_address=f"{self.rng.randint(1, 300)} {self.rng.choice(self.streets)}, {city}",
+                        payment_method=self.rng.choice(["mpesa", "mpesa", "card"]),
+                        created_at=now - timedelta(minutes=self.rng.randint(0, 365 * 24 * 60)),
+                    ))
+                    order_items.append(list(zip(picked, quantities)))
+
+                orders = Order.objects.bulk_create(orders)
+                items, reviews = [], []
+                for order, lines in zip(orders, order_items):
+                    for (product_id, price), quantity in lines:
+                        items.append(OrderItem(order=order, product_id=product_id, quantity=quantity, price=price))
+                        if order.status == 'delivered' and self.rng.random() < 0.3:
+                            reviews.append(Review(
+                                user_id=order.user_id,
+                                product_id=product_id,
+                                rating=self.rng.choices([1, 2, 3, 4, 5], [2, 3, 10, 35, 50])[0],
+                                comment=self.rng.choice(COMMENTS),
+                                created_at=min(now, order.created_at + timedelta(days=self.rng.randint(3, 20))),
+                            ))
+                OrderItem.objects.bulk_create(items, batch_size=self.batch_size)
+                Review.objects.bulk_create(reviews, batch_size=self.batch_size)
+
+                created += count
+                self.stdout.write(f"Created {created}/{total} orders")
+
+    def create_saved_items(self, users, products):
+        saved = [
+            SavedItem(user_id=user_id, product_id=product_id)
+            for user_id in users
+            if self.rng.random() < 0.3
+            for product_id, _ in self.rng.sample(products, k=min(len(products), 3))
+        ]
+        SavedItem.objects.bulk_create(saved, batch_size=self.batch_size, ignore_conflicts=True)
@@ -0,0 +1,167 @@
+"""
+Per-view request metrics collected by core.middleware.RequestMetricsMiddleware.
+
+Samples are kept per process in bounded rolling windows (the last
+REQUEST_METRICS_WINDOW requests per view) and summarised on demand by
+AdminMetricsView. Only sampled requests (REQUEST_METRICS_SAMPLE_RATE) pay for
+collection.
+
+Queries are observed by one execute wrapper installed on every database
+connection as it opens, which reports to the observers of the current
+context (observing_queries()). A connection belongs to a thread, and under
+ASGI the ORM runs in sync_to_async threads rather than the one running the
+middleware; the context, unlike a per-connection wrapper, follows the
+request there.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework import serializers
+
+# Upper bounds (ms) of the wall-time histogram buckets
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf'))
+
+current_sample = ContextVar('current_sample', default=None)
+# Callables taking (sql, duration_ms) for each query run in this context
+query_observers = ContextVar('query_observers', default=())
+
+
+@contextmanager
+def observing_queries(observer):
+    """Call ``observer(sql, duration_ms)`` for every query of the enclosed code, in any thread it hands work to."""
+    token = query_observers.set((*query_observers.get(), observer))
+    try:
+        yield
+    finally:
+        query_observers.reset(token)
+
+
+def observe_query(execute, sql, params, many, context):
+    observers = query_observers.get()
+    if not observers:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration_ms = (time.perf_counter() - started) * 1000
+        for observer in observers:
+            observer(sql, duration_ms)
+
+
+@receiver(connection_created)
+def install_query_observer(sender, connection, **kwargs):
+    # Fires again when a persistent connection reconnects
+    if observe_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(observe_query)
+
+
+class RequestSample:
+    __slots__ = ('wall_ms', 'db_ms', 'serializer_ms', 'queries', 'duplicates', 'bytes', '_sql_seen')
+
+    def __init__(self):
+        self.wall_ms = self.db_ms = self.serializer_ms = 0.0
+        self.queries = self.duplicates = self.bytes = 0
+        self._sql_seen = set()
+
+    def record_query(self, sql, duration_ms):
+        self.queries += 1
+        self.db_ms += duration_ms
+        # Same SQL text with different parameters: the shape of an N+1
+        if sql in self._sql_seen:
+            self.duplicates += 1
+        else:
+            self._sql_seen.add(sql)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(self._new_window)
+
+    @staticmethod
+    def _new_window():
+        return deque(maxlen=settings.REQUEST_METRICS_WINDOW)
+
+    def record(self, view_name, sample):
+        with self._lock:
+            self._samples[view_name].append(sample)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self):
+        with self._lock:
+            windows = {name: list(samples) for name, samples in self._samples.items()}
+        return {name: summarise(samples) for name, samples in sorted(windows.items())}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+def summarise(samples):
+    def stats(attr):
+        values = [getattr(sample, attr) for sample in samples]
+        return {
+            'p50': round(percentile(values, 50), 2),
+            'p95': round(percentile(values, 95), 2),
+            'max': round(max(values), 2),
+        }
+
+    histogram = [0] * len(LATENCY_BUCKETS)
+    for sample in samples:
+        histogram[next(i for i, bound in enumerate(LATENCY_BUCKETS) if sample.wall_ms <= bound)] += 1
+
+    return {
+        'samples': len(samples),
+        'wall_ms': stats('wall_ms'),
+        'db_ms': stats('db_ms'),
+        'serializer_ms': stats('serializer_ms'),
+        'queries': stats('queries'),
+        'duplicate_queries': stats('duplicates'),
+        'bytes': stats('bytes'),
+        'wall_ms_histogram': [
+            {'le': 'inf' if bound == float('inf') else bound, 'count': count}
+            for bound, count in zip(LATENCY_BUCKETS, histogram)
+        ],
+    }
+
+
+registry = MetricsRegistry()
+
+
+def is_outermost(serializer):
+    """True for the top-level serializer, or each item serializer of a top-level many=True list."""
+    parent = serializer.parent
+    return parent is None or (parent.parent is None and isinstance(parent, serializers.ListSerializer))
+
+
+@contextmanager
+def serializer_timer(serializer):
+    """Time the outermost serializer only; nested and per-item calls are covered by it."""
+    sample = current_sample.get()
+    if sample is None or not is_outermost(serializer):
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        sample.serializer_ms += (time.perf_counter() - started) * 1000
+
+
+class TimedSerializerMixin:
+    """Attribute to_representation time to the current request's metrics sample."""
+
+    def to_representation(self, instance):
+        with serializer_timer(self):
+            return super().to_representation(instance)
@@ -0,0 +1,189 @@
+import random
+import time
+from contextlib import contextmanager
+
+import whitenoise.middleware
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:  # optional: responses fall back to gzip
+    brotli = None
+
+from . import prometheus
+from .authentication import has_staff_token
+from .metrics import RequestSample, current_sample, observing_queries, registry
+
+
+class RequestMetricsMiddleware:
+    """
+    Record wall time, DB time, query and duplicate-query counts, serializer time
+    and response size per resolved view, and report them in a Server-Timing
+    header to staff (or anyone when DEBUG is on). Only a
+    REQUEST_METRICS_SAMPLE_RATE fraction of requests is measured.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.REQUEST_METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+        with self.measure() as sample:
+            response = self.get_response(request)
+        return self.report(request, response, sample)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.REQUEST_METRICS_SAMPLE_RATE:
+            return await self.get_response(request)
+        with self.measure() as sample:
+            response = await self.get_response(request)
+        return self.report(request, response, sample)
+
+    @contextmanager
+    def measure(self):
+        sample = RequestSample()
+        token = current_sample.set(sample)
+        started = time.perf_counter()
+        try:
+            with observing_queries(sample.record_query):
+                yield sample
+        finally:
+            current_sample.reset(token)
+        sample.wall_ms = (time.perf_counter() - started) * 1000
+
+    def report(self, request, response, sample):
+        if not response.streaming:
+            sample.bytes = len(response.content)
+        match = request.resolver_match
+        registry.record(match.view_name if match else '<unresolved>', sample)
+
+        # Query counts and DB time tell an attacker which inputs are expensive
+        if not settings.DEBUG and not has_staff_token(request):
+            return response
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={sample.wall_ms:.1f}',
+            f'db;dur={sample.db_ms:.1f};desc="{sample.queries} queries, {sample.duplicates} duplicate"',
+            f'serializer;dur={sample.serializer_ms:.1f}',
+        ])
+        return response
+
+
+class PrometheusMiddleware:
+    """Record latency, status and database usage for every request, by route."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self.measure(request) as observe:
+            return observe(self.get_response(request))
+
+    async def __acall__(self, request):
+        with self.measure(request) as observe:
+            return observe(await self.get_response(request))
+
+    @contextmanager
+    def measure(self, request):
+        """Yield a function that records the response it is passed and returns it."""
+        prometheus.register_worker()
+        queries = [0, 0.0]
+
+        def counter(sql, duration_ms):
+            queries[0] += 1
+            queries[1] += duration_ms / 1000
+
+        def observe(response):
+            elapsed = time.perf_counter() - started
+            match = request.resolver_match
+            route = match.view_name if match else 'unmatched'
+            prometheus.REQUEST_LATENCY.labels(route, request.method).observe(elapsed)
+            prometheus.REQUESTS.labels(route, request.method, response.status_code).inc()
+            if queries[0]:
+                prometheus.DB_QUERIES.labels(route).inc(queries[0])
+                prometheus.DB_TIME.labels(route).inc(queries[1])
+            return response
+
+        started = time.perf_counter()
+        with observing_queries(counter):
+            yield observe
+
+
+class WhiteNoiseMiddleware(whitenoise.middleware.WhiteNoiseMiddleware):
+    """
+    WhiteNoise that can run in an async middleware chain, so ASGI requests
+    don't pay a thread switch to get past it.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+re_accepts_brotli = _lazy_re_compile(r'\bbr\b(?!\s*;\s*q=0(?:\.0*)?\b)')
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compress responses of at least COMPRESSION_MIN_SIZE bytes, preferring
+    brotli (when installed) over gzip. Streaming responses are gzipped.
+    """
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        if (
+            brotli is None
+            or response.streaming
+            or response.has_header('Content-Encoding')
+            or not re_accepts_brotli.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        ):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=settings.BROTLI_QUALITY)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
@@ -0,0 +1,46 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:10
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX product_search_vector_gin ON core_product USING gin (search_vector)'
+        )
+        schema_editor.execute(
+            "UPDATE core_product SET search_vector = "
+            "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+        )
+    elif schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE core_product_fts USING fts5(name, description, tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            'INSERT INTO core_product_fts (rowid, name, description) SELECT id, name, description FROM core_product'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS product_search_vector_gin')
+    elif schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS core_product_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
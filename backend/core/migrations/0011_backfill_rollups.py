@@ -0,0 +1,61 @@
+# Generated by Django 6.0.2 on 2026-10-18 20:40
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_rollups(apps, schema_editor):
+    # 0006 created the rollup tables empty; fill them from order and user
+    # history so the dashboard is right from the first deploy
+    Order = apps.get_model('core', 'Order')
+    OrderItem = apps.get_model('core', 'OrderItem')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Job = apps.get_model('core', 'Job')
+    DailyRollup = apps.get_model('core', 'DailyRollup')
+    DailyStatusRollup = apps.get_model('core', 'DailyStatusRollup')
+    DailyCategoryRollup = apps.get_model('core', 'DailyCategoryRollup')
+    tz = timezone.get_current_timezone()
+    days = {}
+
+    orders = Order.objects.order_by().annotate(day=TruncDate('created_at', tzinfo=tz))
+    for row in orders.values('day').annotate(revenue=Sum('total_amount'), count=Count('id')):
+        days[row['day']] = DailyRollup(date=row['day'], revenue=row['revenue'], order_count=row['count'])
+
+    users = User.objects.order_by().annotate(day=TruncDate('date_joined', tzinfo=tz))
+    for row in users.values('day').annotate(count=Count('id')):
+        days.setdefault(row['day'], DailyRollup(date=row['day'])).new_customers = row['count']
+
+    items = OrderItem.objects.order_by().annotate(day=TruncDate('order__created_at', tzinfo=tz))
+
+    # The backfill counts every order, so queued rollup updates would count twice
+    Job.objects.filter(name__startswith='analytics.', status__in=['pending', 'running', 'failed']).delete()
+    DailyRollup.objects.all().delete()
+    DailyStatusRollup.objects.all().delete()
+    DailyCategoryRollup.objects.all().delete()
+
+    DailyRollup.objects.bulk_create(days.values(), batch_size=1000)
+    DailyStatusRollup.objects.bulk_create(
+        [DailyStatusRollup(date=row['day'], status=row['status'], count=row['count'])
+         for row in orders.values('day', 'status').annotate(count=Count('id'))],
+        batch_size=1000,
+    )
+    DailyCategoryRollup.objects.bulk_create(
+        [DailyCategoryRollup(date=row['day'], category_id=row['product__category'], revenue=row['revenue'])
+         for row in items.values('day', 'product__category').annotate(revenue=Sum(F('price') * F('quantity')))],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_cache_table'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_backfill_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='token_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,15 +1,55 @@
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models import Avg, Count, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.utils.text import slugify
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from .images import refresh_derivatives
+from .search import index_product, unindex_product
+from .cache import (
+    ADDRESSES_VERSION_KEY, PRODUCTS_VERSION_KEY, SAVED_ITEMS_VERSION_KEY, bump_catalog_version,
+    bump_order_version, bump_user_version, bump_version, user_scoped_key
+)
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
     avatar_url = models.URLField(max_length=500, blank=True, null=True) # Fallback for seeded avatars
+    # Resized copies of avatar, see core/images.py
+    avatar_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     bio = models.TextField(max_length=500, blank=True)
     location = models.CharField(max_length=30, blank=True)
+    # Tokens issued before this version are revoked, see core/authentication.py
+    token_version = models.BigIntegerField(default=0, editable=False)
+
+    TRACKED_FIELDS = ('avatar', 'avatar_url', 'bio', 'location')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_values()
+        return instance
+
+    def save(self, *args, **kwargs):
+        # token_version is only written by revoke_user_tokens(), with update():
+        # a profile loaded before a revocation must not write the old one back
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'token_version'
+            ]
+        super().save(*args, **kwargs)
+        self._remember_values()
+
+    def _remember_values(self):
+        self._loaded_values = {field: getattr(self, field) for field in self.TRACKED_FIELDS}
+
+    def has_changed(self):
+        loaded = getattr(self, '_loaded_values', None)
+        return loaded is None or any(getattr(self, field) != value for field, value in loaded.items())
 
     @property
     def avatar_final(self):
@@ -20,19 +60,21 @@ class Profile(models.Model):
     def __str__(self):
         return f"{self.user.username}'s Profile"
 
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    if created:
-        Profile.objects.create(user=instance)
-
+# Profiles are created by RegisterSerializer alongside the user. This only
+# persists a profile that was loaded and edited through ``user.profile``, so a
+# plain User save (e.g. the last_login update) neither reads nor writes it.
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
+    profile = User.profile.related.get_cached_value(instance, default=None)
+    if profile is not None and profile.has_changed():
+        profile.save()
 
 class Category(models.Model):
     name = models.CharField(max_length=255)
     slug = models.SlugField(unique=True, blank=True)
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
+    # Resized copies of image, see core/images.py
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -42,6 +84,41 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+def slug_base(name, max_length=50):
+    return slugify(name)[:max_length].strip('-') or 'product'
+
+def unique_slug(base, taken, max_length=50):
+    """``base``, or the first of ``base-2``, ``base-3``... that is not in ``taken``."""
+    slug, n = base, 2
+    while slug in taken:
+        suffix = f'-{n}'
+        slug = base[:max_length - len(suffix)] + suffix
+        n += 1
+    return slug
+
+class ProductQuerySet(models.QuerySet):
+    def slugs_like(self, bases):
+        """The slugs in use that unique_slug could produce from ``bases``."""
+        query = models.Q()
+        for base in bases:
+            # Suffixed slugs may truncate the base, but never below 40 characters
+            query |= models.Q(slug__startswith=base[:40])
+        return set(self.filter(query).values_list('slug', flat=True)) if bases else set()
+
+    def refresh_ratings(self):
+        """Recompute rating_avg/review_count from Review in a single UPDATE."""
+        reviews = Review.objects.filter(product=OuterRef('pk')).order_by().values('product')
+        return self.update(
+            rating_avg=Coalesce(
+                Subquery(reviews.annotate(avg=Avg('rating')).values('avg'), output_field=models.FloatField()),
+                Value(0.0),
+            ),
+            review_count=Coalesce(
+                Subquery(reviews.annotate(n=Count('id')).values('n'), output_field=models.IntegerField()),
+                Value(0),
+            ),
+        )
+
 class Product(models.Model):
     name = models.CharField(max_length=255)
     slug = models.SlugField(unique=True, blank=True)
@@ -51,13 +128,32 @@ class Product(models.Model):
     stock = models.IntegerField(default=0)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
     image_url = models.URLField(max_length=500, blank=True, null=True)
+    # Resized copies of image, see core/images.py
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     is_featured = models.BooleanField(default=False)
+    # Denormalized from Review; kept in sync by update_product_rating below
+    rating_avg = models.FloatField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    # PostgreSQL only; SQLite searches the core_product_fts table instead (see core/search.py)
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='product_created_id_idx'),
+            # Catalog filter combinations, see core/filters.py
+            models.Index(fields=['category', 'price'], name='product_category_price_idx'),
+            models.Index(fields=['is_featured', '-created_at'], name='product_featured_created_idx'),
+            models.Index(fields=['stock'], name='product_stock_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.name)
+            base = slug_base(self.name)
+            self.slug = unique_slug(base, Product.objects.slugs_like([base]))
         super().save(*args, **kwargs)
 
     @property
@@ -69,6 +165,44 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+class ProductSearchEntry(models.Model):
+    """The SQLite FTS5 table behind product search (core/search.py); absent on PostgreSQL."""
+    product = models.OneToOneField(Product, primary_key=True, db_column='rowid',
+                                   related_name='search_entry', on_delete=models.DO_NOTHING)
+    # FTS5 hidden column named after the table: `= query` is a MATCH
+    document = models.TextField(db_column='core_product_fts')
+    rank = models.FloatField(db_column='rank')
+
+    class Meta:
+        managed = False
+        db_table = 'core_product_fts'
+
+# Registered before invalidate_catalog_cache, so cached catalog responses
+# are rebuilt with the new derivatives
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+def build_image_derivatives(sender, instance, update_fields=None, **kwargs):
+    refresh_derivatives(instance, 'image', update_fields)
+
+@receiver(post_save, sender=Profile)
+def build_avatar_derivatives(sender, instance, update_fields=None, **kwargs):
+    refresh_derivatives(instance, 'avatar', update_fields)
+
+@receiver(post_save, sender=Product)
+def update_product_search_index(sender, instance, **kwargs):
+    index_product(instance)
+
+@receiver(post_delete, sender=Product)
+def remove_product_search_index(sender, instance, **kwargs):
+    unindex_product(instance.pk)
+
+class OrderQuerySet(models.QuerySet):
+    def with_items(self):
+        """Load items and their products in one extra query for OrderSerializer."""
+        return self.prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+        )
+
 class Order(models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
@@ -85,6 +219,13 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='order_created_id_idx'),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.user.username}"
 
@@ -145,5 +286,135 @@ class Review(models.Model):
     comment = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='review_created_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.rating} stars - {self.product.name}"
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def update_product_rating(sender, instance, **kwargs):
+    Product.objects.filter(pk=instance.product_id).refresh_ratings()
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_catalog_cache(sender, **kwargs):
+    bump_catalog_version()
+
+# Order ETags (core/conditional.py). Order items show product fields; stock
+# updates, which use update(), don't reach these.
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_order_item_products(sender, **kwargs):
+    bump_version(PRODUCTS_VERSION_KEY)
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_order_etags(sender, instance, **kwargs):
+    bump_order_version(instance.user_id)
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def invalidate_order_item_etags(sender, instance, **kwargs):
+    if OrderItem.order.is_cached(instance):
+        user_id = instance.order.user_id
+    else:
+        # None once the order is gone (cascade delete); its own receiver covered the user
+        user_id = Order.objects.filter(pk=instance.order_id).values_list('user_id', flat=True).first()
+    bump_order_version(user_id)
+
+# User, address and saved item ETags. Profile saves run after the avatar
+# derivatives receiver, whose update() they cover.
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_etags(sender, instance, **kwargs):
+    bump_user_version(instance.pk)
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_profile_etags(sender, instance, **kwargs):
+    bump_user_version(instance.user_id)
+
+@receiver(post_save, sender=Address)
+@receiver(post_delete, sender=Address)
+def invalidate_address_etags(sender, instance, **kwargs):
+    bump_version(user_scoped_key(ADDRESSES_VERSION_KEY, instance.user_id))
+
+@receiver(post_save, sender=SavedItem)
+@receiver(post_delete, sender=SavedItem)
+def invalidate_saved_item_etags(sender, instance, **kwargs):
+    bump_version(user_scoped_key(SAVED_ITEMS_VERSION_KEY, instance.user_id))
+
+# --- Analytics rollups (maintained by core/analytics.py) ---
+
+class DailyRollup(models.Model):
+    date = models.DateField(unique=True)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_count = models.IntegerField(default=0)
+    new_customers = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.date}: {self.order_count} orders"
+
+class DailyStatusRollup(models.Model):
+    date = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('date', 'status')
+
+    def __str__(self):
+        return f"{self.date} {self.status}: {self.count}"
+
+class DailyCategoryRollup(models.Model):
+    date = models.DateField()
+    category = models.ForeignKey(Category, related_name='daily_rollups', on_delete=models.CASCADE)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('date', 'category')
+
+    def __str__(self):
+        return f"{self.date} {self.category}: {self.revenue}"
+
+# --- Background jobs (run by core/jobs.py) ---
+
+class Job(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    )
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    # Enqueueing a job whose key is taken is a no-op
+    idempotency_key = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    # While running: when another worker may take the job over
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.rating} stars - {self.product.name}"
\ No newline at end of file
+        return f"{self.name} #{self.id} ({self.status})"
@@ -0,0 +1,210 @@
+"""
+Bulk product import: upsert products by slug from CSV or JSON Lines.
+
+Rows are validated and written in chunks of IMPORT_CHUNK_SIZE, each with
+one bulk_create(update_conflicts=True) in its own transaction, so a bad row
+only fails itself. Per chunk the import reads the existing products and any
+unseen categories (by slug or name) in one query each.
+
+A row may carry any ProductImportRowSerializer field. Blank CSV cells count
+as missing, so nightly price/stock updates only need slug, price and stock.
+New products also need name, price and category. Rows without a slug get one from the
+name, suffixed (-2, -3, ...) when it is already taken. Rows that would not
+change anything are skipped.
+"""
+import csv
+import io
+import json
+import os
+
+from django.db import transaction
+from rest_framework import serializers
+
+from .cache import PRODUCTS_VERSION_KEY, bump_catalog_version, bump_version
+from .models import Category, Product, slug_base, unique_slug
+from .search import index_products
+
+IMPORT_CHUNK_SIZE = 1000
+# File extension -> format
+IMPORT_FORMATS = {'csv': 'csv', 'jsonl': 'jsonl', 'ndjson': 'jsonl'}
+REQUIRED_FOR_NEW = ('name', 'price', 'category')
+# Product columns an import writes, besides slug
+WRITTEN_COLUMNS = ('name', 'description', 'price', 'category_id', 'stock', 'image_url', 'is_featured')
+
+
+class ProductImportRowSerializer(serializers.Serializer):
+    slug = serializers.SlugField(max_length=50, required=False)
+    name = serializers.CharField(max_length=255, required=False)
+    description = serializers.CharField(required=False, allow_blank=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    # Slug or name
+    category = serializers.CharField(required=False)
+    stock = serializers.IntegerField(min_value=0, required=False)
+    image_url = serializers.URLField(max_length=500, required=False, allow_blank=True)
+    is_featured = serializers.BooleanField(required=False)
+
+
+def read_rows(stream, import_format):
+    """Yield (line number, row dict or None when the line doesn't parse) from a text stream."""
+    if import_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {key: value for key, value in row.items() if key and value not in ('', None)}
+        return
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+def format_for(filename):
+    return IMPORT_FORMATS.get(os.path.splitext(filename)[1].lower().lstrip('.'))
+
+
+def open_text(binary):
+    # utf-8-sig: spreadsheet exports often start with a BOM
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+
+
+def chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ProductImport:
+    """Imports rows from read_rows(); counts and per-row errors accumulate across chunks."""
+
+    def __init__(self, chunk_size=IMPORT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        # One instance validates every row; binding its fields per row cost
+        # more than the database work
+        self.serializer = ProductImportRowSerializer()
+        self.categories = {}
+        self.created = self.updated = self.unchanged = 0
+        self.errors = []
+
+    def run(self, rows):
+        for chunk in chunked(rows, self.chunk_size):
+            self.import_chunk(chunk)
+        if self.created or self.updated:
+            # bulk_create skips the Product receivers that bump these
+            bump_catalog_version()
+            bump_version(PRODUCTS_VERSION_KEY)
+        return self.report()
+
+    def report(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'errors': self.errors,
+        }
+
+    def error(self, line, row, errors):
+        self.errors.append({
+            'line': line,
+            'slug': (row or {}).get('slug'),
+            'errors': {field: [str(message) for message in messages] for field, messages in errors.items()},
+        })
+
+    def import_chunk(self, chunk):
+        valid = []
+        for line, row in chunk:
+            if row is None:
+                self.error(line, row, {'non_field_errors': ['Not a JSON object.']})
+                continue
+            try:
+                valid.append((line, self.serializer.run_validation(row)))
+            except serializers.ValidationError as exc:
+                self.error(line, row, exc.detail)
+
+        self.load_categories({data['category'] for _, data in valid if 'category' in data})
+        with transaction.atomic():
+            existing = {
+                product['slug']: product for product in
+                Product.objects.filter(slug__in=[data['slug'] for _, data in valid if 'slug' in data])
+                .values('id', 'slug', *WRITTEN_COLUMNS)
+            }
+            products = self.build_products(valid, existing)
+            if not products:
+                return
+            Product.objects.bulk_create(
+                products.values(), update_conflicts=True, unique_fields=['slug'],
+                update_fields=[*WRITTEN_COLUMNS, 'updated_at'],
+            )
+            # bulk_create skips the post_save receivers that index products
+            reindex = [
+                slug for slug, product in products.items()
+                if slug not in existing
+                or (product.name, product.description) != (existing[slug]['name'], existing[slug]['description'])
+            ]
+            if reindex:
+                index_products(Product, list(Product.objects.filter(slug__in=reindex).values_list('id', flat=True)))
+
+    def load_categories(self, values):
+        missing = values - self.categories.keys()
+        if missing:
+            for category in Category.objects.filter(slug__in=missing) | Category.objects.filter(name__in=missing):
+                self.categories[category.slug] = self.categories[category.name] = category.id
+
+    def build_products(self, valid, existing):
+        """Products to upsert, keyed by slug; the last row for a slug wins."""
+        products, lines = {}, {}
+        slugless = []
+        for line, data in valid:
+            category_id = self.categories.get(data.get('category'))
+            if 'category' in data and category_id is None:
+                self.error(line, data, {'category': [f"Unknown category '{data['category']}'."]})
+                continue
+
+            current = existing.get(data.get('slug'))
+            if current is None:
+                missing = [field for field in REQUIRED_FOR_NEW if field not in data]
+                if missing:
+                    self.error(line, data, {field: ['Required for new products.'] for field in missing})
+                    continue
+                current = {'description': '', 'stock': 0, 'image_url': None, 'is_featured': False}
+
+            values = {**current, **{k: v for k, v in data.items() if k in WRITTEN_COLUMNS}}
+            if category_id is not None:
+                values['category_id'] = category_id
+            if 'id' in current and all(values[column] == current[column] for column in WRITTEN_COLUMNS):
+                self.unchanged += 1
+                continue
+
+            product = Product(**{column: values[column] for column in WRITTEN_COLUMNS})
+            if 'slug' not in data:
+                slugless.append(product)
+                continue
+            if data['slug'] in lines:
+                self.error(lines[data['slug']], data, {'slug': [f'Superseded by line {line}.']})
+                self.count(products[data['slug']], existing, -1)
+            product.slug = data['slug']
+            products[product.slug], lines[product.slug] = product, line
+            self.count(product, existing, 1)
+
+        if slugless:
+            bases = {slug_base(product.name) for product in slugless}
+            taken = Product.objects.slugs_like(bases) | products.keys()
+            for product in slugless:
+                product.slug = unique_slug(slug_base(product.name), taken)
+                taken.add(product.slug)
+                products[product.slug] = product
+                self.created += 1
+        return products
+
+    def count(self, product, existing, step):
+        if product.slug in existing:
+            self.updated += step
+        else:
+            self.created += step
@@ -0,0 +1,100 @@
+"""
+Prometheus metrics served at /metrics.
+
+Request, query, cache and worker metrics are recorded in-process by
+core.middleware.PrometheusMiddleware and the receivers below. Under gunicorn,
+PROMETHEUS_MULTIPROC_DIR (set in gunicorn.conf.py) makes prometheus_client
+write them to per-worker files that a scrape aggregates. Business gauges are
+read from the database at scrape time from rollups and indexed counts only,
+so a scrape costs the same however large the tables grow.
+"""
+import os
+import time
+
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+REQUEST_LATENCY = Histogram(
+    'nexus_request_duration_seconds', 'Request latency by route.', ['route', 'method'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS = Counter('nexus_requests_total', 'Requests by route and status.', ['route', 'method', 'status'])
+DB_QUERIES = Counter('nexus_db_queries_total', 'Database queries by route.', ['route'])
+DB_TIME = Counter('nexus_db_query_seconds_total', 'Time spent in database queries by route.', ['route'])
+CATALOG_CACHE = Counter('nexus_catalog_cache_requests_total', 'Catalog cache lookups.', ['result'])
+REVIEWS_CREATED = Counter('nexus_reviews_created_total', 'Reviews created.')
+ORDERS_CREATED = Counter('nexus_orders_created_total', 'Orders created.')
+WORKER_STARTED = Gauge(
+    'nexus_worker_start_time_seconds', 'Start time of each live worker (labelled by pid under gunicorn).',
+    multiprocess_mode='liveall',
+)
+
+_registered_pid = None
+
+
+def register_worker():
+    """Record this process as a live worker; cheap to call on every request."""
+    global _registered_pid
+    pid = os.getpid()
+    if _registered_pid != pid:
+        _registered_pid = pid
+        WORKER_STARTED.set(time.time())
+
+
+class BusinessCollector:
+    """Scrape-time gauges read from rollups and indexed counts."""
+
+    def describe(self):
+        return [
+            GaugeMetricFamily('nexus_orders', 'Orders by status.', labels=['status']),
+            GaugeMetricFamily('nexus_low_stock_products', 'Products at or below the low-stock threshold.'),
+        ]
+
+    def collect(self):
+        # core.cache imports this module while core.models is still loading
+        from .models import DailyStatusRollup, Order, Product
+
+        orders = GaugeMetricFamily('nexus_orders', 'Orders by status.', labels=['status'])
+        # Summed from the per-day rollups: grows with days, not orders
+        counts = dict(
+            DailyStatusRollup.objects.order_by().values('status')
+            .annotate(total=Sum('count')).values_list('status', 'total')
+        )
+        for status, _ in Order.STATUS_CHOICES:
+            orders.add_metric([status], counts.get(status) or 0)
+        yield orders
+
+        # Range scan on product_stock_idx
+        yield GaugeMetricFamily(
+            'nexus_low_stock_products', 'Products at or below the low-stock threshold.',
+            value=Product.objects.filter(stock__lte=settings.LOW_STOCK_THRESHOLD).count(),
+        )
+
+
+business_registry = CollectorRegistry(auto_describe=True)
+business_registry.register(BusinessCollector())
+
+
+def render_metrics():
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(business_registry)
+
+
+@receiver(post_save, sender='core.Review')
+def count_review(sender, instance, created, **kwargs):
+    if created:
+        REVIEWS_CREATED.inc()
+
+
+@receiver(post_save, sender='core.Order')
+def count_order(sender, instance, created, **kwargs):
+    if created:
+        ORDERS_CREATED.inc()
@@ -0,0 +1,85 @@
+"""
+JSON renderer and parser backed by orjson.
+
+Output matches DRF's JSONRenderer byte for byte: compact separators, UTF-8,
+datetimes in ISO 8601 with "Z" for UTC, Decimals outside DecimalFields as
+numbers, and U+2028/U+2029 escaped. Types orjson doesn't know go through
+DRF's encoder. The exception is out-of-range floats (NaN, Infinity), which
+orjson writes as null where DRF's strict mode (STRICT_JSON, the default)
+raises ValueError; with STRICT_JSON off, which writes them as NaN and
+Infinity literals, rendering is left to DRF. Without orjson installed, or for
+indented output (the browsable API), both classes behave exactly like DRF's.
+
+Also home to the CSV and NDJSON renderers the admin exports negotiate with.
+"""
+import csv
+import io
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.exceptions import ParseError
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional accelerator
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or not self.strict
+                or self.get_indent(accepted_media_type, renderer_context or {})):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=JSONEncoder().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Negotiates text/csv for the admin exports (core.exports), which stream
+    their own body. Only error responses are rendered here, as field,message rows.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for field, messages in (data.items() if isinstance(data, dict) else [('detail', data)]):
+            for message in (messages if isinstance(messages, list) else [messages]):
+                writer.writerow([field, message])
+        return buffer.getvalue().encode(self.charset)
+
+
+class NDJSONRenderer(FastJSONRenderer):
+    """Negotiates application/x-ndjson for the admin exports; errors render as one JSON line."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return super().render(data, accepted_media_type, renderer_context) + b'\n'
@@ -0,0 +1,95 @@
+"""
+Product full-text search.
+
+On PostgreSQL products carry a weighted ``search_vector`` column backed by a
+GIN index. On SQLite (the default local database) an FTS5 virtual table,
+``core_product_fts``, mirrors name and description keyed by product id.
+Both are refreshed from the Product post_save/post_delete signals.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection, models
+
+SEARCH_CONFIG = 'english'
+FTS_TABLE = 'core_product_fts'
+
+
+def product_search_vector():
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+    )
+
+
+def fts_match_expression(query):
+    """Turn free text into an FTS5 MATCH string of quoted prefix terms."""
+    terms = re.findall(r'\w+', query)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_products(queryset, query):
+    """Filter ``queryset`` to products matching ``query``, annotated with ``search_rank``."""
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(models.F('search_vector'), search_query)
+        )
+
+    match = fts_match_expression(query)
+    if not match:
+        return queryset.none()
+    # Join the FTS table (ProductSearchEntry) so bm25 rank is computed once per
+    # match; rank is lower-is-better, negate it so both backends rank descending
+    return queryset.filter(search_entry__document=match).annotate(
+        search_rank=-models.F('search_entry__rank')
+    )
+
+
+def index_product(product):
+    if connection.vendor == 'postgresql':
+        type(product).objects.filter(pk=product.pk).update(search_vector=product_search_vector())
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)',
+            [product.pk, product.name, product.description],
+        )
+
+
+def unindex_product(product_id):
+    if connection.vendor == 'postgresql':
+        return  # the vector lives on the deleted row
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product_id])
+
+
+def index_products(product_model, ids):
+    """Re-index the products with these ids; for rows written with bulk_create/update."""
+    if not ids:
+        return
+    if connection.vendor == 'postgresql':
+        product_model.objects.filter(id__in=ids).update(search_vector=product_search_vector())
+        return
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', list(ids))
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, description) '
+            f'SELECT id, name, description FROM core_product WHERE id IN ({placeholders})',
+            list(ids),
+        )
+
+
+def rebuild_search_index(product_model):
+    """Re-index every product in one statement; for rows written with bulk_create/update."""
+    if connection.vendor == 'postgresql':
+        product_model.objects.update(search_vector=product_search_vector())
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, description) '
+            f'SELECT id, name, description FROM core_product'
+        )
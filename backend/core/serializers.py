@@ -1,30 +1,111 @@
-from rest_framework import serializers
+from decimal import Decimal
+from rest_framework import permissions, serializers
 from django.contrib.auth.models import User
-from django.db.models import Avg
+from django.db import transaction
+from django.db.models import Case, F, Prefetch, When, prefetch_related_objects
+from .analytics import record_order_items
+from .cache import bump_catalog_version
+from .images import srcset
+from .metrics import TimedSerializerMixin, is_outermost
 from .models import Product, Category, Order, OrderItem, Address, Review, SavedItem, Profile
 
-class ProfileSerializer(serializers.ModelSerializer):
-    avatar = serializers.CharField(source='avatar_final', read_only=True)
+def parse_fields(value):
+    """
+    Parse ``?fields=id,name,product_details.price`` into a tree of wanted field
+    names: {'id': {}, 'name': {}, 'product_details': {'price': {}}}. An empty
+    subtree means the whole field.
+    """
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in filter(None, (part.strip() for part in path.split('.'))):
+            node = node.setdefault(name, {})
+    return tree
 
+def requested_fields(request, param='fields'):
+    """The ``?fields=`` (or ``?expand=``) tree of a read request, or None when not given."""
+    if request is None or request.method not in permissions.SAFE_METHODS:
+        return None
+    value = request.query_params.get(param)
+    return parse_fields(value) if value else None
+
+def is_rendered(name, wanted, expanded, expandable):
+    # Naming a field in ?fields= implies expanding it
+    if wanted:
+        return name in wanted
+    return name not in expandable or name in expanded
+
+def renders_field(request, serializer_class, name):
+    """Whether a top-level field of ``serializer_class`` renders for this request; lets views skip its queries."""
+    return is_rendered(
+        name, requested_fields(request), requested_fields(request, 'expand') or {},
+        getattr(serializer_class.Meta, 'expandable_fields', ()),
+    )
+
+class SparseFieldsMixin:
+    """
+    Keep only the fields named by ``?fields=``, and leave out fields listed in
+    Meta.expandable_fields unless ``?expand=`` names them. Both take dotted
+    paths into nested serializers. Dropped fields are never bound, so their
+    source lookups and get_<field> methods don't run.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if is_outermost(self):
+            request = self.context.get('request')
+            wanted, expanded = requested_fields(request), requested_fields(request, 'expand') or {}
+        else:
+            wanted, expanded = getattr(self, 'wanted_fields', None), getattr(self, 'expanded_fields', {})
+        expandable = getattr(self.Meta, 'expandable_fields', ())
+        if not wanted and not expandable and not expanded:
+            return fields
+
+        kept = {}
+        for name, field in fields.items():
+            if is_rendered(name, wanted, expanded, expandable):
+                nested = field.child if isinstance(field, serializers.ListSerializer) else field
+                nested.wanted_fields = wanted[name] if wanted else None
+                nested.expanded_fields = expanded.get(name, {})
+                kept[name] = field
+        return kept
+
+class SrcsetField(serializers.Field):
+    """
+    ``{"webp": "url 200w, url 400w", "jpeg": ...}`` for the resized copies of
+    an image field (core/images.py), read from the field and its
+    ``<field>_derivatives`` record on the source object. {} when there are none.
+    """
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs.setdefault('source', '*')
+        super().__init__(read_only=True, **kwargs)
+
+    def to_representation(self, value):
+        return srcset(getattr(value, self.image_field), getattr(value, f'{self.image_field}_derivatives'))
+
+class BaseModelSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
+    """Base for the core serializers: sparse fieldsets and serialization timing."""
+
+class ProfileSerializer(BaseModelSerializer):
     class Meta:
         model = Profile
-        fields = ['avatar', 'bio', 'location']
+        fields = ['bio', 'location']
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(BaseModelSerializer):
     profile = ProfileSerializer(read_only=True)
-    # Using serializer method field to be safe
-    avatar = serializers.SerializerMethodField()
+    # Serialized once here rather than again inside ``profile``; a missing
+    # profile renders as null. Querysets should select_related('profile').
+    avatar = serializers.CharField(source='profile.avatar_final', read_only=True)
+    avatar_srcset = SrcsetField('avatar', source='profile')
 
     class Meta:
         model = User
-        fields = ('id', 'username', 'email', 'first_name', 'last_name', 'is_staff', 'profile', 'avatar')
-
-    def get_avatar(self, obj):
-        if hasattr(obj, 'profile'):
-            return obj.profile.avatar_final
-        return None
+        fields = ('id', 'username', 'email', 'first_name', 'last_name', 'is_staff', 'profile', 'avatar',
+                  'avatar_srcset')
 
-class RegisterSerializer(serializers.ModelSerializer):
+class RegisterSerializer(BaseModelSerializer):
     password = serializers.CharField(write_only=True)
     email = serializers.EmailField(required=True)
 
@@ -32,6 +113,7 @@ class RegisterSerializer(serializers.ModelSerializer):
         model = User
         fields = ('username', 'password', 'email', 'first_name', 'last_name')
 
+    @transaction.atomic
     def create(self, validated_data):
         user = User.objects.create_user(
             username=validated_data['username'],
@@ -40,78 +122,125 @@ class RegisterSerializer(serializers.ModelSerializer):
             first_name=validated_data.get('first_name', ''),
             last_name=validated_data.get('last_name', '')
         )
+        Profile.objects.create(user=user)
         return user
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(BaseModelSerializer):
+    image_srcset = SrcsetField('image')
+
     class Meta:
         model = Category
-        fields = '__all__'
+        exclude = ['image_derivatives']
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(BaseModelSerializer):
     user_name = serializers.CharField(source='user.username', read_only=True)
-    user_avatar = serializers.SerializerMethodField()
+    # Querysets should select_related('user__profile')
+    user_avatar = serializers.CharField(source='user.profile.avatar_final', read_only=True)
 
     class Meta:
         model = Review
         fields = ['id', 'user_name', 'user_avatar', 'rating', 'comment', 'created_at', 'product']
         read_only_fields = ['user', 'product']
 
-    def get_user_avatar(self, obj):
-        if hasattr(obj.user, 'profile'):
-            return obj.user.profile.avatar_final
-        return None
-
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(BaseModelSerializer):
     category_details = CategorySerializer(source='category', read_only=True)
     image = serializers.SerializerMethodField()
-    rating = serializers.SerializerMethodField()
-    review_count = serializers.SerializerMethodField()
+    image_srcset = SrcsetField('image')
+    rating = serializers.FloatField(source='rating_avg', read_only=True)
 
     class Meta:
         model = Product
-        fields = '__all__'
-        extra_fields = ['category_details']
+        exclude = ['rating_avg', 'search_vector', 'image_derivatives']
+        read_only_fields = ['review_count']
+        expandable_fields = ['category_details']
 
     def get_image(self, obj):
         if obj.image:
             return obj.image.url
         return obj.image_url
 
-    def get_rating(self, obj):
-        return obj.reviews.aggregate(Avg('rating'))['rating__avg'] or 0
+# Mirrors the checkout page: 16% VAT plus a flat shipping fee per city
+TAX_RATE = Decimal('0.16')
+SHIPPING_FEES = {'Nairobi': Decimal('500')}
+DEFAULT_SHIPPING_FEE = Decimal('1500')
 
-    def get_review_count(self, obj):
-        return obj.reviews.count()
-
-class OrderItemSerializer(serializers.ModelSerializer):
-    product_id = serializers.PrimaryKeyRelatedField(
-        queryset=Product.objects.all(), source='product', write_only=True
-    )
+class OrderItemSerializer(BaseModelSerializer):
+    # Plain integer: products are looked up (and locked) in one query by OrderSerializer.create
+    product_id = serializers.IntegerField(write_only=True)
     product_name = serializers.CharField(source='product.name', read_only=True)
     product_image = serializers.CharField(source='product.image_final', read_only=True)
 
     class Meta:
         model = OrderItem
         fields = ['id', 'product_id', 'product_name', 'product_image', 'quantity', 'price']
+        read_only_fields = ['price']
+        extra_kwargs = {'quantity': {'min_value': 1}}
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(BaseModelSerializer):
     items = OrderItemSerializer(many=True)
+    shipping_city = serializers.CharField(write_only=True, required=False, default='')
 
     class Meta:
         model = Order
-        fields = ['id', 'user', 'status', 'total_amount', 'shipping_address', 'payment_method', 'items', 'created_at']
-        read_only_fields = ['user', 'created_at', 'status']
+        fields = ['id', 'user', 'status', 'total_amount', 'shipping_address', 'shipping_city',
+                  'payment_method', 'items', 'created_at']
+        read_only_fields = ['user', 'created_at', 'status', 'total_amount']
+
+    def validate_items(self, value):
+        if not value:
+            raise serializers.ValidationError("An order needs at least one item.")
+        return value
 
     def create(self, validated_data):
         items_data = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
+        shipping_city = validated_data.pop('shipping_city')
 
+        quantities = {}
         for item_data in items_data:
-            OrderItem.objects.create(order=order, **item_data)
+            product_id = item_data['product_id']
+            quantities[product_id] = quantities.get(product_id, 0) + item_data['quantity']
+
+        with transaction.atomic():
+            products = Product.objects.select_for_update().in_bulk(list(quantities))
+
+            errors = []
+            for product_id, quantity in quantities.items():
+                product = products.get(product_id)
+                if product is None:
+                    errors.append(f"Product {product_id} does not exist.")
+                elif product.stock < quantity:
+                    errors.append(f"Only {product.stock} of {product.name} left in stock.")
+            if errors:
+                raise serializers.ValidationError({'items': errors})
+
+            Product.objects.filter(id__in=quantities).update(stock=F('stock') - Case(
+                *[When(id=product_id, then=quantity) for product_id, quantity in quantities.items()]
+            ))
+            # update() skips the Product signals; stock is part of the cached catalog
+            bump_catalog_version()
+
+            subtotal = sum(products[pid].price * qty for pid, qty in quantities.items())
+            shipping_fee = SHIPPING_FEES.get(shipping_city, DEFAULT_SHIPPING_FEE)
+            total = subtotal + subtotal * TAX_RATE + shipping_fee
+
+            order = Order.objects.create(total_amount=total.quantize(Decimal('0.01')), **validated_data)
+            items = OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=products[item_data['product_id']],
+                    quantity=item_data['quantity'],
+                    price=products[item_data['product_id']].price,
+                )
+                for item_data in items_data
+            ])
+            # bulk_create skips the OrderItem signals that feed the category rollup
+            record_order_items(order, items, key=f'order-items:{order.id}')
 
+        # Serve the response's nested items in one query
+        prefetch_related_objects([order], Prefetch('items', queryset=OrderItem.objects.select_related('product')))
         return order
 
-class AddressSerializer(serializers.ModelSerializer):
+class AddressSerializer(BaseModelSerializer):
     class Meta:
         model = Address
         fields = [
@@ -121,10 +250,35 @@ class AddressSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['user']
 
-class SavedItemSerializer(serializers.ModelSerializer):
-    product_details = ProductSerializer(source='product', read_only=True)
+class ProductCardSerializer(BaseModelSerializer):
+    """Compact product for lists of products the client already knows about."""
+    image = serializers.CharField(source='image_final', read_only=True)
+    image_srcset = SrcsetField('image')
+    rating = serializers.FloatField(source='rating_avg', read_only=True)
+
+    # Product columns the card reads, for .only()
+    COLUMNS = ('id', 'slug', 'name', 'price', 'image', 'image_url', 'image_derivatives', 'rating_avg')
+
+    class Meta:
+        model = Product
+        fields = ['id', 'slug', 'name', 'price', 'image', 'image_srcset', 'rating']
+
+class SavedItemSerializer(BaseModelSerializer):
+    product_details = ProductCardSerializer(source='product', read_only=True)
 
     class Meta:
         model = SavedItem
         fields = ['id', 'product', 'product_details', 'created_at']
-        read_only_fields = ['user', 'created_at']
\ No newline at end of file
+        read_only_fields = ['user', 'created_at']
+
+class SavedItemBatchSerializer(serializers.Serializer):
+    product_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=200,
+    )
+
+    def validate_product_ids(self, value):
+        product_ids = set(value)
+        missing = product_ids - set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+        if missing:
+            raise serializers.ValidationError(f'Unknown products: {sorted(missing)}')
+        return sorted(product_ids)
@@ -1,3 +1,1159 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import shutil
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from PIL import Image
+from prometheus_client import REGISTRY
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from .admin import JobAdmin
+from .analytics import analytics_summary, rebuild_rollups, record_order_items
+from .authentication import ClaimsTokenObtainPairSerializer, revoke_user_tokens, token_version_key
+from .images import derivative_name
+from .jobs import claim, enqueue, job, run_due_jobs, run_job
+from .metrics import registry
+from .product_import import IMPORT_CHUNK_SIZE, ProductImport, read_rows
+from .models import Address, Category, Job, Product, Order, OrderItem, Profile, Review, SavedItem
+from .renderers import FastJSONRenderer
+
+
+class OrderQueryCountTests(TestCase):
+    """The order endpoints must not issue per-order or per-item queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@nova.com', 'admin123')
+        category = Category.objects.create(name='Audio')
+        cls.products = Product.objects.bulk_create([
+            Product(name=f'Speaker {i}', slug=f'speaker-{i}', description='Speaker',
+                    price=1000 + i, category=category, stock=10)
+            for i in range(5)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def create_orders(self, count):
+        orders = Order.objects.bulk_create([
+            Order(user=self.admin, total_amount=2000, shipping_address='Nairobi', payment_method='mpesa')
+            for _ in range(count)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price=product.price)
+            for order in orders
+            for product in self.products[:2]
+        ])
+
+    def test_order_list_query_count_is_constant(self):
+        for count in (10, 100, 1000):
+            with self.subTest(orders=count):
+                Order.objects.all().delete()
+                self.create_orders(count)
+                # Orders, items + products; the ETag comes from the cache
+                with self.assertNumQueries(2):
+                    response = self.client.get('/api/orders/')
+                self.assertEqual(len(response.data), count)
+
+    def test_admin_order_list_query_count_is_constant(self):
+        for count in (10, 100, 1000):
+            with self.subTest(orders=count):
+                Order.objects.all().delete()
+                self.create_orders(count)
+                with self.assertNumQueries(2):
+                    response = self.client.get('/api/admin/orders/')
+                self.assertEqual(len(response.data['results'][0]['items']), 2)
+
+    def test_admin_analytics_query_count_is_constant(self):
+        for count in (10, 100, 1000):
+            with self.subTest(orders=count):
+                Order.objects.all().delete()
+                self.create_orders(count)
+                # bulk_create skips the rollup receivers
+                rebuild_rollups()
+                # daily series, status counts, category revenue, recent orders, items + products
+                with self.assertNumQueries(5):
+                    response = self.client.get('/api/admin/analytics/')
+                self.assertEqual(response.data['total_orders'], count)
+
+
+class OrderETagTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@nova.com', 'admin123')
+        cls.speaker = Product.objects.create(name='Speaker', description='', price=1000,
+                                             category=Category.objects.create(name='Audio'), stock=10)
+        cls.order = Order.objects.create(user=cls.admin, total_amount=1000, shipping_address='Nairobi',
+                                         payment_method='mpesa')
+        cls.item = OrderItem.objects.create(order=cls.order, product=cls.speaker, quantity=1, price=1000)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def assertNotModified(self, url, etag):
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_unchanged_orders_are_not_modified_without_queries(self):
+        for url in ('/api/orders/', '/api/admin/orders/', f'/api/orders/{self.order.id}/'):
+            with self.subTest(url=url):
+                self.assertNotModified(url, self.client.get(url)['ETag'])
+
+    @override_settings(COMPRESSION_MIN_SIZE=0)
+    def test_weak_etag_of_a_compressed_response_matches(self):
+        # Enough body that gzip, with its random-length BREACH padding, always shrinks it
+        Order.objects.bulk_create([
+            Order(user=self.admin, total_amount=1000, shipping_address='Nairobi', payment_method='mpesa')
+            for _ in range(10)
+        ])
+        response = self.client.get('/api/orders/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertNotModified('/api/orders/', response['ETag'])
+
+    def test_item_and_product_changes_change_the_etag(self):
+        etag = self.client.get('/api/orders/')['ETag']
+        self.item.quantity = 2
+        self.item.save()
+        self.assertEqual(self.client.get('/api/orders/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get('/api/admin/orders/')['ETag']
+        self.speaker.name = 'Bookshelf Speaker'
+        self.speaker.save()
+        response = self.client.get('/api/admin/orders/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.data['results'][0]['items'][0]['product_name'], 'Bookshelf Speaker')
+
+
+
+class UserETagTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@nova.com', 'admin123')
+        cls.profile = Profile.objects.create(user=cls.admin, bio='Hi')
+        cls.speaker = Product.objects.create(name='Speaker', description='', price=1000,
+                                             category=Category.objects.create(name='Audio'), stock=10)
+        order = Order.objects.create(user=cls.admin, total_amount=1000, shipping_address='Nairobi',
+                                     payment_method='mpesa')
+        OrderItem.objects.create(order=order, product=cls.speaker, quantity=1, price=1000)
+        Address.objects.create(user=cls.admin, street='Moi Avenue', city='Nairobi', phone='0700000000')
+        Review.objects.create(product=cls.speaker, user=cls.admin, rating=4, comment='Good')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        token = ClaimsTokenObtainPairSerializer.get_token(self.admin).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def assertNotModified(self, url, etag):
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_unchanged_responses_are_not_modified_without_queries(self):
+        for url in ('/api/auth/users/me/', '/api/addresses/', '/api/saved-items/', '/api/reviews/',
+                    f'/api/reviews/?product={self.speaker.id}', '/api/purchased-products/', '/api/admin/customers/'):
+            with self.subTest(url=url):
+                self.assertNotModified(url, self.client.get(url)['ETag'])
+
+    def test_user_and_profile_changes_change_the_etag(self):
+        etags = {url: self.client.get(url)['ETag'] for url in ('/api/auth/users/me/', '/api/admin/customers/')}
+        self.profile.bio = 'Hello'
+        self.profile.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+        etag = self.client.get('/api/auth/users/me/')['ETag']
+        self.admin.first_name = 'Ada'
+        self.admin.save()
+        response = self.client.get('/api/auth/users/me/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.data['first_name'], 'Ada')
+
+    def test_user_scoped_writes_change_the_etag(self):
+        etag = self.client.get('/api/addresses/')['ETag']
+        self.client.post('/api/addresses/', {'street': 'Kenyatta Avenue', 'city': 'Nairobi', 'phone': '0711111111'})
+        self.assertEqual(len(self.client.get('/api/addresses/', HTTP_IF_NONE_MATCH=etag).data), 2)
+
+        # The batch endpoint bulk-creates, which sends no post_save
+        etag = self.client.get('/api/saved-items/')['ETag']
+        self.client.post('/api/saved-items/batch/', {'product_ids': [self.speaker.id]}, format='json')
+        self.assertEqual(self.client.get('/api/saved-items/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get('/api/reviews/')['ETag']
+        Review.objects.create(product=self.speaker, user=self.admin, rating=5, comment='Great')
+        self.assertEqual(self.client.get('/api/reviews/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+class ProfileQueryCountTests(TestCase):
+    """Avatars come from an eagerly loaded profile, never a per-row lookup."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@nova.com', 'admin123')
+        category = Category.objects.create(name='Audio')
+        cls.product = Product.objects.create(name='Speaker', slug='speaker', description='Speaker',
+                                             price=1000, category=category, stock=10)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def create_reviewers(self, count):
+        users = [User.objects.create_user(f'reviewer-{i}') for i in range(Review.objects.count(), count)]
+        Review.objects.bulk_create([
+            Review(user=user, product=self.product, rating=4, comment='Good') for user in users
+        ])
+
+    def test_review_list_query_count_is_constant(self):
+        for count in (10, 100):
+            with self.subTest(reviews=count):
+                self.create_reviewers(count)
+                with self.assertNumQueries(1):
+                    response = self.client.get('/api/reviews/', {'page_size': 100})
+                self.assertEqual(len(response.data['results']), min(count, 100))
+                self.assertIn('user_avatar', response.data['results'][0])
+
+    def test_admin_customer_list_query_count_is_constant(self):
+        for count in (10, 100):
+            with self.subTest(users=count):
+                self.create_reviewers(count)
+                with self.assertNumQueries(1):
+                    response = self.client.get('/api/admin/customers/', {'page_size': 100})
+                self.assertEqual(len(response.data['results']), min(User.objects.count(), 100))
+                self.assertIn('avatar', response.data['results'][0])
+
+    def test_avatar_is_not_repeated_inside_profile(self):
+        Profile.objects.create(user=self.admin, avatar_url='https://example.com/a.png')
+        response = self.client.get('/api/auth/users/me/')
+        self.assertEqual(response.data['avatar'], 'https://example.com/a.png')
+        self.assertNotIn('avatar', response.data['profile'])
+
+
+class ProfilePersistenceTests(TestCase):
+    def test_registration_creates_the_profile(self):
+        response = APIClient().post('/api/auth/register/', {
+            'username': 'wanjiru', 'email': 'wanjiru@nova.com', 'password': 'Secret123!',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Profile.objects.filter(user__username='wanjiru').exists())
+
+    def test_user_save_skips_an_unchanged_profile(self):
+        user = User.objects.create_user('wanjiru')
+        Profile.objects.create(user=user)
+        user = User.objects.select_related('profile').get(pk=user.pk)
+        with self.assertNumQueries(1):
+            user.save(update_fields=['last_login'])
+
+    def test_user_save_persists_profile_edits(self):
+        user = User.objects.create_user('wanjiru')
+        Profile.objects.create(user=user)
+        user = User.objects.get(pk=user.pk)
+        user.profile.location = 'Nairobi'
+        user.save()
+        self.assertEqual(Profile.objects.get(user=user).location, 'Nairobi')
+
+
+class StatelessAuthTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('wanjiru', 'wanjiru@nova.com', 'Secret123!')
+        Profile.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        response = self.client.post('/api/auth/token/', {'username': 'wanjiru', 'password': 'Secret123!'})
+        self.tokens = response.data
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+
+    def test_authenticated_requests_do_not_load_the_user(self):
+        # Orders only; no auth_user lookup
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/orders/').status_code, 200)
+        self.assertFalse(any('auth_user' in query['sql'] for query in queries.captured_queries))
+
+    def test_current_user_loads_the_full_model(self):
+        response = self.client.get('/api/auth/users/me/')
+        self.assertEqual(response.data['email'], 'wanjiru@nova.com')
+
+    def test_deactivation_revokes_issued_tokens(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/orders/').status_code, 401)
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': self.tokens['refresh']})
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_reissues_claims_from_the_database(self):
+        self.assertEqual(self.client.get('/api/admin/orders/').status_code, 403)
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': self.tokens['refresh']})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(self.client.get('/api/admin/orders/').status_code, 200)
+
+    def test_password_change_revokes_earlier_tokens(self):
+        self.user.set_password('Secret456!')
+        self.user.save()
+        self.assertEqual(self.client.get('/api/orders/').status_code, 401)
+        response = APIClient().post('/api/auth/token/', {'username': 'wanjiru', 'password': 'Secret456!'})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(self.client.get('/api/orders/').status_code, 200)
+
+    def test_tokens_issued_right_after_a_revocation_are_valid(self):
+        revoke_user_tokens(self.user.pk)
+        # Within the same second, so an issued-at comparison can't tell them apart
+        token = ClaimsTokenObtainPairSerializer.get_token(User.objects.get(pk=self.user.pk))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token.access_token}')
+        self.assertEqual(self.client.get('/api/orders/').status_code, 200)
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': str(token)})
+        self.assertEqual(response.status_code, 200)
+
+    def test_refresh_tokens_stay_revoked_when_the_cache_loses_the_marker(self):
+        self.user.set_password('Secret456!')
+        self.user.save()
+        # Past MAX_ENTRIES (300) the cache culls, taking the revocation marker
+        for i in range(400):
+            cache.set(f'catalog:{i}', 'response')
+        self.assertIsNone(cache.get(token_version_key(self.user.pk)))
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': self.tokens['refresh']})
+        self.assertEqual(response.status_code, 401)
+
+        tokens = APIClient().post('/api/auth/token/', {'username': 'wanjiru', 'password': 'Secret456!'}).data
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_saves_keep_the_token_version(self):
+        profile = Profile.objects.get(user=self.user)
+        revoke_user_tokens(self.user.pk)
+        profile.bio = 'Loaded before the revocation'
+        profile.save()
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': self.tokens['refresh']})
+        self.assertEqual(response.status_code, 401)
+
+    def test_login_rehashing_the_password_keeps_tokens_valid(self):
+        User.objects.filter(pk=self.user.pk).update(password=make_password('Secret123!', hasher='pbkdf2_sha1'))
+        response = APIClient().post('/api/auth/token/', {'username': 'wanjiru', 'password': 'Secret123!'})
+        self.assertTrue(User.objects.get(pk=self.user.pk).password.startswith('pbkdf2_sha256$'))
+        self.assertEqual(self.client.get('/api/orders/').status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(self.client.get('/api/orders/').status_code, 200)
+
+
+class SavedItemBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('wanjiru')
+        category = Category.objects.create(name='Audio')
+        cls.products = Product.objects.bulk_create([
+            Product(name=f'Speaker {i}', slug=f'speaker-{i}', description='Speaker',
+                    price=1000, category=category, stock=10)
+            for i in range(60)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def product_ids(self, products):
+        return [product.id for product in products]
+
+    def test_batch_save_skips_existing_items_in_constant_queries(self):
+        SavedItem.objects.create(user=self.user, product=self.products[0])
+        # validation, savepoint, insert, release, saved items with products
+        with self.assertNumQueries(5):
+            response = self.client.post('/api/saved-items/batch/', {'product_ids': self.product_ids(self.products[:50])},
+                                        format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 50)
+        self.assertEqual(set(response.data[0]['product_details']),
+                         {'id', 'slug', 'name', 'price', 'image', 'image_srcset', 'rating'})
+
+    def test_batch_delete(self):
+        SavedItem.objects.bulk_create([SavedItem(user=self.user, product=product) for product in self.products[:10]])
+        response = self.client.delete('/api/saved-items/batch/', {'product_ids': self.product_ids(self.products[:5])},
+                                      format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(item['product'] for item in response.data), self.product_ids(self.products[5:10]))
+
+    def test_sparse_fields_skip_the_product_join(self):
+        SavedItem.objects.bulk_create([SavedItem(user=self.user, product=product) for product in self.products[:10]])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/saved-items/', {'fields': 'id,product'})
+        self.assertEqual(response.data[0].keys(), {'id', 'product'})
+        self.assertNotIn('core_product', queries.captured_queries[-1]['sql'])
+
+        response = self.client.get('/api/saved-items/', {'fields': 'id,product_details.name'})
+        self.assertEqual(response.data[0], {'id': response.data[0]['id'], 'product_details': {'name': 'Speaker 0'}})
+
+    def test_unknown_products_are_rejected(self):
+        response = self.client.post('/api/saved-items/batch/', {'product_ids': [self.products[0].id, 999999]},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(SavedItem.objects.exists())
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@nova.com', 'admin123')
+        customers = User.objects.bulk_create([User(username=f'customer-{i}') for i in range(30)])
+        category = Category.objects.create(name='Audio')
+        # Created in one statement, so they share created_at and order by id
+        products = Product.objects.bulk_create([
+            Product(name=f'Speaker {i}', slug=f'speaker-{i}', description='Speaker',
+                    price=1000, category=category, stock=10)
+            for i in range(30)
+        ])
+        Review.objects.bulk_create([
+            Review(user=customer, product=products[0], rating=4, comment='Warm') for customer in customers
+        ])
+        Order.objects.bulk_create([
+            Order(user=customer, total_amount=1000, shipping_address='Nairobi', payment_method='mpesa')
+            for customer in customers
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def follow(self, path):
+        """Every result of the list at ``path``, 12 per page, following next."""
+        results, url, pages = [], path, 0
+        while url:
+            response = self.client.get(url, {'page_size': 12} if url == path else None)
+            self.assertEqual(response.status_code, 200)
+            results += response.data['results']
+            url, pages = response.data['next'], pages + 1
+        self.assertEqual(pages, 3)
+        return results
+
+    def test_following_next_lists_every_row_once_newest_first(self):
+        for path, model in [('/api/products/', Product), ('/api/reviews/', Review), ('/api/admin/orders/', Order)]:
+            with self.subTest(path=path):
+                ids = [row['id'] for row in self.follow(path)]
+                self.assertEqual(ids, list(model.objects.order_by('-created_at', '-id').values_list('id', flat=True)))
+
+    def test_admin_customers_are_ordered_by_descending_id(self):
+        ids = [row['id'] for row in self.follow('/api/admin/customers/')]
+        self.assertEqual(ids, sorted(User.objects.values_list('id', flat=True), reverse=True))
+
+
+class ProductRatingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('wanjiru', 'wanjiru@nova.com', 'Secret123!')
+        cls.other = User.objects.create_user('otieno', 'otieno@nova.com', 'Secret123!')
+        cls.product = Product.objects.create(name='Speaker', slug='speaker', description='Speaker', price=1000,
+                                             category=Category.objects.create(name='Audio'), stock=10)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertRating(self, rating_avg, review_count):
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_avg, self.product.review_count), (rating_avg, review_count))
+
+    def test_review_writes_keep_the_rating_current(self):
+        Review.objects.create(product=self.product, user=self.other, rating=2, comment='Tinny')
+        response = self.client.post('/api/reviews/', {'product': self.product.id, 'rating': 5, 'comment': 'Great'})
+        self.assertEqual(response.status_code, 201)
+        self.assertRating(3.5, 2)
+
+        self.client.patch(f"/api/reviews/{response.data['id']}/", {'rating': 4})
+        self.assertRating(3.0, 2)
+
+        self.client.delete(f"/api/reviews/{response.data['id']}/")
+        self.assertRating(2.0, 1)
+
+    def test_rebuild_ratings_fixes_drift_and_invalidates_cached_products(self):
+        Review.objects.create(product=self.product, user=self.other, rating=4, comment='Good')
+        Product.objects.update(rating_avg=0, review_count=0)
+        url = f'/api/products/{self.product.slug}/'
+        self.assertEqual(self.client.get(url).data['rating'], 0)
+
+        call_command('rebuild_ratings', batch_size=1, stdout=io.StringIO())
+        self.assertRating(4.0, 1)
+        self.assertEqual(self.client.get(url).data['rating'], 4.0)
+
+
+class CatalogCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('wanjiru')
+        cls.category = Category.objects.create(name='Audio')
+        cls.products = [
+            Product.objects.create(name=f'Speaker {i}', description='Speaker', price=1000, category=cls.category)
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_entries_are_not_shared_across_hosts(self):
+        response = self.client.get('/api/products/', {'page_size': 1}, HTTP_HOST='evil.example')
+        self.assertTrue(response.json()['next'].startswith('http://evil.example/'))
+        response = self.client.get('/api/products/', {'page_size': 1})
+        self.assertTrue(response.json()['next'].startswith('http://testserver/'))
+
+    def test_product_category_and_review_saves_invalidate_cached_responses(self):
+        product = self.products[0]
+        path = f'/api/products/{product.slug}/'
+        self.client.get(path)
+
+        product.name = 'Bookshelf Speaker'
+        product.save()
+        self.assertEqual(self.client.get(path).json()['name'], 'Bookshelf Speaker')
+
+        self.category.name = 'Hi-Fi'
+        self.category.save()
+        self.assertEqual(self.client.get('/api/categories/').json()[0]['name'], 'Hi-Fi')
+
+        Review.objects.create(user=self.user, product=product, rating=4, comment='Warm')
+        self.assertEqual(self.client.get(path).json()['review_count'], 1)
+
+
+class ProductFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('Audio', 'Smart Home'):
+            Product.objects.create(name=f'{name} thing', description='', price=1000,
+                                   category=Category.objects.create(name=name))
+
+    def test_category_matches_slug_or_name(self):
+        for value in ('smart-home', 'Smart Home', 'smart home'):
+            response = self.client.get('/api/products/', {'category': value})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([p['name'] for p in response.data['results']], ['Smart Home thing'], value)
+            self.assertEqual([c['slug'] for c in response.data['facets']['categories']], ['smart-home'])
+
+
+class SparseFieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Audio')
+        Product.objects.bulk_create([
+            Product(name=f'Speaker {i}', slug=f'speaker-{i}', description='Speaker ' * 50,
+                    price=1000, category=category, stock=10)
+            for i in range(30)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_category_is_only_embedded_when_expanded(self):
+        with CaptureQueriesContext(connection) as queries:
+            product = self.client.get('/api/products/').data['results'][0]
+        self.assertNotIn('category_details', product)
+        self.assertNotIn('search_vector', product)
+        self.assertFalse(any('core_category' in query['sql'] for query in queries.captured_queries[1:]))
+
+        product = self.client.get('/api/products/', {'expand': 'category_details'}).data['results'][0]
+        self.assertEqual(product['category_details']['name'], 'Audio')
+
+    def test_fields_limit_the_representation(self):
+        product = self.client.get('/api/products/', {'fields': 'id,name,category_details.slug'}).data['results'][0]
+        self.assertEqual(product.keys(), {'id', 'name', 'category_details'})
+        self.assertEqual(product['category_details'], {'slug': 'audio'})
+
+
+@override_settings(COMPRESSION_MIN_SIZE=1024)
+class CompressionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Audio')
+        Product.objects.bulk_create([
+            Product(name=f'Speaker {i}', slug=f'speaker-{i}', description='Speaker ' * 50,
+                    price=1000, category=category, stock=10)
+            for i in range(30)
+        ])
+
+    def test_large_responses_are_compressed(self):
+        response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_brotli_is_preferred_when_accepted(self):
+        response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_small_responses_are_sent_as_is(self):
+        response = self.client.get('/api/categories/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class FastJSONRendererTests(TestCase):
+    def test_output_matches_drf(self):
+        data = {
+            'price': Decimal('1234.50'),
+            'created_at': datetime(2026, 1, 2, 3, 4, 5, 678, tzinfo=dt_timezone.utc),
+            'midnight': datetime(2026, 1, 2, tzinfo=dt_timezone.utc),
+            'day': date(2026, 1, 2),
+            'text': 'line\u2028separator',
+            'lazy': gettext_lazy('Not found.'),
+            'counts': {1: 2},
+            'nested': [{'rating': 4.5, 'none': None, 'flag': True}],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_out_of_range_floats(self):
+        data = {'nan': float('nan'), 'inf': float('inf')}
+        # Where DRF's strict mode raises ValueError
+        self.assertEqual(FastJSONRenderer().render(data), b'{"nan":null,"inf":null}')
+        with self.assertRaises(ValueError):
+            JSONRenderer().render(data)
+
+        class NonStrictRenderer(FastJSONRenderer):
+            strict = False
+
+        self.assertEqual(NonStrictRenderer().render(data), b'{"nan":NaN,"inf":Infinity}')
+
+
+class CheckoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('bob', 'bob@nova.com', 'password123')
+        category = Category.objects.create(name='Gaming')
+        cls.mouse = Product.objects.create(name='Gaming Mouse', description='Mouse', price=8000,
+                                           category=category, stock=5)
+        cls.keyboard = Product.objects.create(name='Gaming Keyboard', description='Keyboard', price=15000,
+                                              category=category, stock=1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def checkout(self, items, city='Nairobi'):
+        return self.client.post('/api/orders/', {
+            'shipping_address': f'1 Moi Avenue, {city}',
+            'shipping_city': city,
+            'payment_method': 'mpesa',
+            'total_amount': 1,
+            'items': items,
+        }, format='json')
+
+    def test_prices_and_total_are_computed_on_the_server(self):
+        response = self.checkout([
+            {'product_id': self.mouse.id, 'quantity': 2, 'price': 1},
+            {'product_id': self.keyboard.id, 'quantity': 1, 'price': 1},
+        ])
+        self.assertEqual(response.status_code, 201, response.data)
+        # 31000 subtotal + 16% VAT + 500 Nairobi shipping
+        self.assertEqual(response.data['total_amount'], '36460.00')
+        self.assertEqual(sorted(item['price'] for item in response.data['items']), ['15000.00', '8000.00'])
+
+    def test_stock_is_decremented(self):
+        self.checkout([{'product_id': self.mouse.id, 'quantity': 2}])
+        self.mouse.refresh_from_db()
+        self.assertEqual(self.mouse.stock, 3)
+
+    def test_overselling_is_rejected_without_side_effects(self):
+        response = self.checkout([
+            {'product_id': self.mouse.id, 'quantity': 1},
+            {'product_id': self.keyboard.id, 'quantity': 2},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.mouse.refresh_from_db()
+        self.assertEqual(self.mouse.stock, 5)
+        self.assertFalse(Order.objects.exists())
+
+    def test_checkout_statement_count_does_not_grow_with_items(self):
+        items = [{'product_id': self.mouse.id, 'quantity': 1}, {'product_id': self.keyboard.id, 'quantity': 1}]
+        # savepoint, lock products, update stock, insert order, queue its rollup, insert items,
+        # queue their rollup, release, response items
+        with self.assertNumQueries(9):
+            self.checkout(items)
+
+
+@override_settings(REQUEST_METRICS_SAMPLE_RATE=1.0)
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@nova.com', 'admin123')
+        category = Category.objects.create(name='Audio')
+        Product.objects.create(name='Speaker', slug='speaker', description='Speaker',
+                               price=1000, category=category, stock=10)
+
+    def setUp(self):
+        registry.reset()
+        self.client = APIClient()
+        self.authenticate(self.admin)
+
+    def authenticate(self, user):
+        token = ClaimsTokenObtainPairSerializer.get_token(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_sampled_response_carries_server_timing(self):
+        response = self.client.get('/api/orders/')
+        self.assertRegex(response['Server-Timing'], r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries')
+
+    def test_server_timing_is_for_staff_or_debug_only(self):
+        self.authenticate(User.objects.create_user('wanjiru'))
+        self.assertNotIn('Server-Timing', self.client.get('/api/orders/'))
+        self.client.credentials()
+        self.assertNotIn('Server-Timing', self.client.get('/api/products/'))
+        with self.settings(DEBUG=True):
+            self.assertIn('Server-Timing', self.client.get('/api/products/'))
+        # Still measured for the admin metrics endpoint
+        self.assertEqual(registry.summary()['product-list']['samples'], 2)
+
+    def test_unsampled_requests_are_not_measured(self):
+        with self.settings(REQUEST_METRICS_SAMPLE_RATE=0):
+            response = self.client.get('/api/orders/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(registry.summary(), {})
+
+    def test_metrics_endpoint_summarises_per_view(self):
+        self.client.get('/api/products/')
+        self.client.get('/api/products/')
+        response = self.client.get('/api/admin/metrics/')
+        products = response.data['views']['product-list']
+        self.assertEqual(products['samples'], 2)
+        self.assertGreater(products['queries']['max'], 0)
+        self.assertGreater(products['bytes']['p50'], 0)
+        self.assertEqual(sum(bucket['count'] for bucket in products['wall_ms_histogram']), 2)
+
+    def test_metrics_endpoint_is_admin_only(self):
+        self.client.force_authenticate(User.objects.create_user('shopper', password='pw'))
+        self.assertEqual(self.client.get('/api/admin/metrics/').status_code, 403)
+
+
+@override_settings(METRICS_TOKEN='secret')
+class PrometheusMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Audio')
+        Product.objects.bulk_create([
+            Product(name=f'Speaker {i}', slug=f'speaker-{i}', description='Speaker',
+                    price=1000, category=category, stock=i)
+            for i in range(10)
+        ])
+
+    def scrape(self):
+        return self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+
+    def test_exposes_route_latency_and_business_gauges(self):
+        self.client.get('/api/products/')
+        response = self.scrape()
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('nexus_request_duration_seconds_bucket{le="0.005",method="GET",route="product-list"}', body)
+        self.assertIn('nexus_db_queries_total{route="product-list"}', body)
+        self.assertIn('nexus_catalog_cache_requests_total{result="miss"}', body)
+        self.assertIn('nexus_orders{status="pending"} 0.0', body)
+        self.assertIn('nexus_low_stock_products 6.0', body)
+
+    def test_scrape_cost_is_fixed(self):
+        # Status rollup sum and the low-stock count
+        with self.assertNumQueries(2):
+            self.scrape()
+
+    def test_token_is_required(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        self.assertEqual(self.scrape().status_code, 200)
+
+    def test_without_a_token_it_is_served_in_debug_only(self):
+        with self.settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+            with self.settings(DEBUG=True):
+                self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+class AsyncReadPathTests(TestCase):
+    """The ASGI URLconf's async views return what the DRF views do."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('achieng', 'achieng@nova.com', 'Secret123!')
+        Profile.objects.create(user=cls.user, bio='Audiophile')
+        category = Category.objects.create(name='Audio')
+        products = Product.objects.bulk_create([
+            Product(name=f'Speaker {i}', slug=f'speaker-{i}', description='Speaker',
+                    price=1000 * i, category=category, stock=i)
+            for i in range(30)
+        ])
+        Review.objects.create(user=cls.user, product=products[0], rating=4, comment='Warm')
+
+    def setUp(self):
+        cache.clear()
+
+    def get_async(self, path, data=None, **extra):
+        with override_settings(ROOT_URLCONF='nexus_api.asgi_urls'):
+            response = async_to_sync(self.async_client.get)(path, data, **extra)
+            self.assertEqual(response.resolver_match.func.__module__, 'core.async_views')
+        return response
+
+    def test_reads_match_the_sync_views(self):
+        for path, data in [
+            ('/api/products/', {'page_size': 5, 'in_stock': 'true', 'expand': 'category_details'}),
+            ('/api/products/speaker-3/', None),
+            ('/api/products/missing/', None),
+            ('/api/categories/', None),
+            ('/api/reviews/', {'product': Review.objects.get().product_id}),
+        ]:
+            with self.subTest(path=path):
+                cache.clear()
+                expected = self.client.get(path, data)
+                cache.clear()
+                response = self.get_async(path, data)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.json(), expected.json())
+
+    def test_catalog_cache_is_shared_with_the_sync_views(self):
+        expected = self.client.get('/api/products/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_async('/api/products/')
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response['ETag'], expected['ETag'])
+
+    def test_cursor_pages_follow_on(self):
+        first = self.get_async('/api/products/', {'page_size': 20}).json()
+        second = self.get_async(first['next']).json()
+        ids = [p['id'] for p in first['results'] + second['results']]
+        self.assertEqual(len(set(ids)), 30)
+        self.assertIsNone(second['next'])
+
+    def test_current_user_requires_a_token(self):
+        response = self.get_async('/api/auth/users/me/')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+
+        access = self.client.post(
+            '/api/auth/token/', {'username': 'achieng', 'password': 'Secret123!'}
+        ).json()['access']
+        response = self.get_async('/api/auth/users/me/', headers={'Authorization': f'Bearer {access}'})
+        self.assertEqual(response.json()['profile'], {'bio': 'Audiophile', 'location': ''})
+
+    def test_queries_are_counted_in_the_threads_running_them(self):
+        registry.reset()
+        before = REGISTRY.get_sample_value('nexus_db_queries_total', {'route': 'product-list'}) or 0
+        with self.settings(REQUEST_METRICS_SAMPLE_RATE=1):
+            self.get_async('/api/products/')
+        self.assertGreater(registry.summary()['product-list']['queries']['max'], 0)
+        self.assertGreater(REGISTRY.get_sample_value('nexus_db_queries_total', {'route': 'product-list'}), before)
+
+    def test_writes_go_to_the_sync_views(self):
+        with override_settings(ROOT_URLCONF='nexus_api.asgi_urls'):
+            response = async_to_sync(self.async_client.post)(
+                '/api/products/', {'name': 'Amp'}, content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 401)
+
+
+class AdminExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@nova.com', 'admin123')
+        cls.customer = User.objects.create_user('baraka', 'baraka@nova.com', 'Secret123!')
+        Profile.objects.create(user=cls.customer, location='Mombasa')
+        category = Category.objects.create(name='Audio')
+        speaker = Product.objects.create(name='Speaker, bookshelf', slug='speaker', description='Speaker',
+                                         price=1000, category=category, stock=10)
+        amp = Product.objects.create(name='Amp', slug='amp', description='Amp',
+                                     price=3000, category=category, stock=10)
+        for status in ['pending', 'delivered', 'cancelled']:
+            order = Order.objects.create(user=cls.customer, status=status, total_amount=5000,
+                                         shipping_address='Nyali', payment_method='mpesa')
+            OrderItem.objects.create(order=order, product=speaker, quantity=2, price=1000)
+            OrderItem.objects.create(order=order, product=amp, quantity=1, price=3000)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def download(self, path, data=None, **extra):
+        response = self.client.get(path, data, **extra)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_orders_stream_as_csv_with_items(self):
+        # Orders, then the chunk's items with their products
+        with self.assertNumQueries(2):
+            response, body = self.download('/api/admin/orders/export/')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="orders-', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['items'], '2 x Speaker, bookshelf; 1 x Amp')
+        self.assertEqual(rows[0]['item_count'], '3')
+        self.assertEqual(rows[0]['username'], 'baraka')
+
+    def test_orders_stream_as_ndjson_filtered_by_status_and_date(self):
+        today = date.today().isoformat()
+        _, body = self.download('/api/admin/orders/export/', {'format': 'ndjson', 'status': 'delivered',
+                                                              'start': today, 'end': today})
+        orders = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([order['status'] for order in orders], ['delivered'])
+        self.assertEqual(orders[0]['total_amount'], '5000.00')
+        self.assertEqual(orders[0]['items'][1], {'product_id': Product.objects.get(slug='amp').id,
+                                                 'product_name': 'Amp', 'quantity': 1, 'price': '3000.00'})
+
+        _, body = self.download('/api/admin/orders/export/', {'start': '2000-01-01', 'end': '2000-01-31'},
+                                HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(body, '')
+
+    def test_invalid_filters_are_rejected(self):
+        response = self.client.get('/api/admin/orders/export/', {'status': 'lost'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('status,', response.content.decode())
+
+    def test_customers_export_totals_orders(self):
+        with self.assertNumQueries(1):
+            _, body = self.download('/api/admin/customers/export/', {'status': 'active'})
+        rows = {row['username']: row for row in csv.DictReader(io.StringIO(body))}
+        self.assertEqual(rows.keys(), {'admin', 'baraka'})
+        self.assertEqual(rows['baraka']['order_count'], '3')
+        self.assertEqual(rows['baraka']['total_spent'], '10000.00')
+        self.assertEqual(rows['baraka']['location'], 'Mombasa')
+
+    def test_csv_cells_that_look_like_formulas_are_escaped(self):
+        User.objects.filter(pk=self.customer.pk).update(first_name='=HYPERLINK("http://evil")', last_name='@SUM(A1)')
+        _, body = self.download('/api/admin/customers/export/')
+        row = next(row for row in csv.DictReader(io.StringIO(body)) if row['username'] == 'baraka')
+        self.assertEqual(row['first_name'], '\'=HYPERLINK("http://evil")')
+        self.assertEqual(row['last_name'], "'@SUM(A1)")
+        self.assertEqual(row['total_spent'], '10000.00')
+
+    def test_exports_are_admin_only(self):
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/admin/orders/export/').status_code, 403)
+
+
+class ProductImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@nova.com', 'admin123')
+        cls.audio = Category.objects.create(name='Audio')
+        Category.objects.create(name='Phones')
+        Product.objects.create(name='Speaker', slug='speaker', description='Bookshelf speaker',
+                               price=1000, category=cls.audio, stock=5)
+
+    def run_import(self, text, import_format='csv', chunk_size=IMPORT_CHUNK_SIZE):
+        return ProductImport(chunk_size).run(read_rows(io.StringIO(text), import_format))
+
+    def test_upserts_by_slug_and_reports_bad_rows(self):
+        report = self.run_import(
+            'slug,name,price,stock,category\n'
+            'speaker,,1200,3,\n'                 # update: price and stock only
+            ',Speaker,5000,1,phones\n'           # new, generated slug collides
+            'amp,Amp,3000,2,Audio\n'             # new, category by name
+            'tv,TV,abc,1,audio\n'                # invalid price
+            'radio,Radio,100,1,kitchen\n'        # unknown category
+            'mic,,100,1,audio\n'                 # new without a name
+        )
+        self.assertEqual((report['created'], report['updated'], report['unchanged']), (2, 1, 0))
+        self.assertEqual([(error['line'], list(error['errors'])) for error in report['errors']],
+                         [(5, ['price']), (6, ['category']), (7, ['name'])])
+
+        speaker = Product.objects.get(slug='speaker')
+        self.assertEqual((speaker.price, speaker.stock, speaker.description), (Decimal('1200'), 3, 'Bookshelf speaker'))
+        self.assertEqual(Product.objects.get(slug='speaker-2').category.slug, 'phones')
+        self.assertEqual(Product.objects.get(slug='amp').category, self.audio)
+        # bulk_create skips the search-index receivers
+        self.assertEqual(self.client.get('/api/products/', {'q': 'amp'}).data['results'][0]['slug'], 'amp')
+
+    def test_unchanged_rows_are_skipped(self):
+        report = self.run_import('{"slug": "speaker", "price": "1000.00", "stock": 5}\n', 'jsonl')
+        self.assertEqual((report['created'], report['updated'], report['unchanged']), (0, 0, 1))
+
+    def test_queries_are_per_chunk(self):
+        rows = ''.join(f'{{"slug": "p-{i}", "name": "P {i}", "price": 10, "category": "audio"}}\n' for i in range(50))
+        # Categories once; per chunk a savepoint and its release, existing
+        # products, the upsert, ids to index, FTS delete and insert
+        with self.assertNumQueries(1 + 2 * 5 + 2 * 2):
+            report = self.run_import(rows, 'jsonl', chunk_size=25)
+        self.assertEqual(report['created'], 50)
+
+    def test_admin_upload(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        upload = SimpleUploadedFile('nightly.csv', b'\xef\xbb\xbfslug,stock\nspeaker,9\n', content_type='text/csv')
+        response = client.post('/api/admin/products/import/', {'file': upload})
+        self.assertEqual(response.data, {'created': 0, 'updated': 1, 'unchanged': 0, 'errors': []})
+        self.assertEqual(Product.objects.get(slug='speaker').stock, 9)
+
+        response = client.post('/api/admin/products/import/', {'file': SimpleUploadedFile('nightly.xlsx', b'')})
+        self.assertEqual(response.status_code, 400)
+
+    def test_save_resolves_slug_collisions(self):
+        product = Product.objects.create(name='Speaker', description='', price=1, category=self.audio)
+        self.assertEqual(product.slug, 'speaker-2')
+
+
+def image_upload(name, size, mode='RGB'):
+    output = io.BytesIO()
+    Image.new(mode, size, 'red').save(output, 'PNG')
+    return SimpleUploadedFile(name, output.getvalue(), content_type='image/png')
+
+
+class ImageDerivativeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.audio = Category.objects.create(name='Audio')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = self.settings(MEDIA_ROOT=media_root, MEDIA_URL='/media/')
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def create_product(self, image):
+        return Product.objects.create(name='Speaker', description='', price=1, category=self.audio, image=image)
+
+    def test_upload_builds_resized_webp_and_jpeg(self):
+        product = self.create_product(image_upload('lamp.png', (1000, 500), 'RGBA'))
+        self.assertEqual(product.image_derivatives['widths'], [200, 400, 800])
+        storage = product.image.storage
+        with storage.open(derivative_name(product.image.name, 400, 'webp')) as webp:
+            self.assertEqual(Image.open(webp).size, (400, 200))
+        with storage.open(derivative_name(product.image.name, 200, 'jpeg')) as jpeg:
+            self.assertEqual(Image.open(jpeg).format, 'JPEG')
+
+        data = self.client.get(f'/api/products/{product.slug}/').data
+        self.assertEqual(data['image_srcset']['webp'].split(', ')[0], '/media/derivatives/products/lamp-200w.webp 200w')
+        self.assertEqual(len(data['image_srcset']['jpeg'].split(', ')), 3)
+        self.assertNotIn('image_derivatives', data)
+
+    def test_small_images_are_not_upscaled(self):
+        product = self.create_product(image_upload('icon.png', (120, 120)))
+        self.assertEqual(product.image_derivatives['widths'], [120])
+
+    def test_unchanged_image_is_not_rebuilt(self):
+        product = self.create_product(image_upload('lamp.png', (300, 300)))
+        product.stock = 4
+        with self.assertNumQueries(3):  # product update, FTS delete and insert
+            product.save()
+
+    def test_command_backfills_images_set_without_save(self):
+        product = self.create_product(None)
+        name = product.image.storage.save('products/seeded.png', image_upload('seeded.png', (600, 300)))
+        Product.objects.filter(pk=product.pk).update(image=name)
+        self.assertEqual(self.client.get(f'/api/products/{product.slug}/').data['image_srcset'], {})
+
+        call_command('build_image_derivatives', stdout=io.StringIO())
+        product.refresh_from_db()
+        self.assertEqual(product.image_derivatives['widths'], [200, 400])
+
+
+@job('tests.create_category')
+def create_category_job(name, fail=False):
+    Category.objects.create(name=name)
+    if fail:
+        raise RuntimeError('Payment provider unavailable')
+
+
+class JobQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('bob', 'bob@nova.com', 'password123')
+        cls.gaming = Category.objects.create(name='Gaming')
+        cls.mouse = Product.objects.create(name='Gaming Mouse', description='Mouse', price=8000,
+                                           category=cls.gaming, stock=5)
+
+    def test_checkout_only_enqueues_the_rollups(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/orders/', {
+            'shipping_address': '1 Moi Avenue, Nairobi', 'shipping_city': 'Nairobi', 'payment_method': 'mpesa',
+            'items': [{'product_id': self.mouse.id, 'quantity': 2}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(analytics_summary()['total_orders'], 0)
+
+        self.assertEqual(run_due_jobs(), (2, 0))
+        summary = analytics_summary()
+        self.assertEqual((summary['total_orders'], summary['total_revenue']), (1, Decimal('19060.00')))
+        self.assertEqual(summary['status_counts'], {'pending': 1})
+        self.assertEqual(summary['category_revenue'][0]['revenue'], Decimal('16000.00'))
+
+    def test_idempotency_key_deduplicates(self):
+        enqueue('tests.create_category', {'name': 'Audio'}, key='audio')
+        enqueue('tests.create_category', {'name': 'Audio'}, key='audio')
+        self.assertEqual(run_due_jobs(), (1, 0))
+        enqueue('tests.create_category', {'name': 'Audio'}, key='audio')
+        self.assertEqual(run_due_jobs(), (0, 0))
+        self.assertEqual(Category.objects.filter(name='Audio').count(), 1)
+
+    def test_failures_roll_back_and_retry_with_backoff(self):
+        enqueue('tests.create_category', {'name': 'Audio', 'fail': True}, max_attempts=2)
+        self.assertEqual(run_due_jobs(), (0, 1))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('Payment provider unavailable', job.last_error)
+        self.assertFalse(Category.objects.filter(name='Audio').exists())
+
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(run_due_jobs(), (0, 1))
+        self.assertEqual(Job.objects.get().status, 'failed')
+
+    def test_jobs_of_a_dead_worker_are_taken_over(self):
+        enqueue('tests.create_category', {'name': 'Audio'})
+        Job.objects.update(status='running', attempts=1, locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(run_due_jobs(), (1, 0))
+        self.assertEqual(Job.objects.get().attempts, 2)
+
+    def test_a_job_taken_over_mid_run_rolls_back(self):
+        enqueue('tests.create_category', {'name': 'Audio'})
+        [(pk, lease)] = claim(1)
+        # Its lease ran out and another worker claimed it
+        Job.objects.update(locked_until=lease + timedelta(minutes=1))
+        self.assertFalse(run_job(pk, lease))
+        self.assertFalse(Category.objects.filter(name='Audio').exists())
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.locked_until, job.last_error), ('running', lease + timedelta(minutes=1), ''))
+
+    def test_admin_retries_failed_jobs_only(self):
+        for status in ('pending', 'succeeded', 'failed'):
+            enqueue('tests.create_category', {'name': status}, key=status)
+            Job.objects.filter(idempotency_key=status).update(status=status, attempts=5)
+        JobAdmin(Job, admin.site).retry(None, Job.objects.all())
+        self.assertEqual(dict(Job.objects.values_list('idempotency_key', 'status')),
+                         {'pending': 'pending', 'succeeded': 'succeeded', 'failed': 'pending'})
+        self.assertEqual(Job.objects.get(idempotency_key='succeeded').attempts, 5)
+
+    def test_rebuild_drops_only_the_jobs_of_what_it_counted(self):
+        order = Order.objects.create(user=self.user, total_amount=1000, shipping_address='Nairobi',
+                                     payment_method='mpesa')
+        Job.objects.filter(idempotency_key=f'order-created:{order.pk}').update(status='failed')
+        record_order_items(order, [], key=f'order-items:{order.pk}')
+        Job.objects.filter(idempotency_key=f'order-items:{order.pk}').update(status='running')
+        # The job of an order committed after the rebuild read the orders
+        enqueue('analytics.order_created', {'day': timezone.localdate().isoformat(), 'revenue': '500',
+                                            'status': 'pending'}, key='order-created:999999')
+        rebuild_rollups()
+        self.assertEqual(list(Job.objects.values_list('idempotency_key', flat=True)), ['order-created:999999'])
+        self.assertEqual(analytics_summary()['total_orders'], 1)
+        self.assertEqual(run_due_jobs(), (1, 0))
+        self.assertEqual(analytics_summary()['total_orders'], 2)
+
+    def test_a_job_deleted_after_its_claim_fails_quietly(self):
+        enqueue('tests.create_category', {'name': 'Audio'})
+        [(pk, lease)] = claim(1)
+        Job.objects.all().delete()
+        self.assertFalse(run_job(pk, lease))
+        self.assertFalse(Category.objects.filter(name='Audio').exists())
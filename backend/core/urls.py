@@ -3,7 +3,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     ProductViewSet, CategoryViewSet, OrderViewSet, AddressViewSet,
     ReviewViewSet, SavedItemViewSet, AdminUserViewSet, AdminOrderViewSet,
-    AdminAnalyticsView, CurrentUserView, PurchasedProductsView
+    AdminAnalyticsView, AdminMetricsView, AdminProductImportView, CurrentUserView, PurchasedProductsView
 )
 
 router = DefaultRouter()
@@ -20,5 +20,7 @@ urlpatterns = [
     path('', include(router.urls)),
     path('auth/users/me/', CurrentUserView.as_view(), name='current-user'),
     path('admin/analytics/', AdminAnalyticsView.as_view(), name='admin-analytics'),
+    path('admin/metrics/', AdminMetricsView.as_view(), name='admin-metrics'),
+    path('admin/products/import/', AdminProductImportView.as_view(), name='admin-product-import'),
     path('purchased-products/', PurchasedProductsView.as_view(), name='purchased-products'),
 ]
\ No newline at end of file
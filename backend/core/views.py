@@ -1,131 +1,307 @@
 from django.shortcuts import render
 from rest_framework import viewsets, permissions, status, generics
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from prometheus_client import CONTENT_TYPE_LATEST
 from django.contrib.auth.models import User
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import Max
 from .models import Product, Category, Order, OrderItem, Address, Review, SavedItem, Profile
 from .serializers import (
     ProductSerializer, CategorySerializer, OrderSerializer,
     AddressSerializer, ReviewSerializer, UserSerializer,
-    RegisterSerializer, SavedItemSerializer
+    RegisterSerializer, SavedItemSerializer, SavedItemBatchSerializer, ProductCardSerializer,
+    renders_field
 )
+from .pagination import CreatedAtCursorPagination, ProductCursorPagination, UserCursorPagination
+from .search import search_products
+from .filters import (
+    CustomerExportFilterSerializer, DateRangeSerializer, OrderExportFilterSerializer,
+    date_range_filter, filter_products, product_facets
+)
+from .product_import import ProductImport, format_for, open_text, read_rows
+from .exports import CUSTOMER_COLUMNS, ORDER_COLUMNS, customer_rows, export_response, order_rows
+from .renderers import CSVRenderer, NDJSONRenderer
+from .analytics import analytics_summary
+from .cache import (
+    ADDRESSES_VERSION_KEY, ORDERS_VERSION_KEY, PRODUCTS_VERSION_KEY, SAVED_ITEMS_VERSION_KEY, USERS_VERSION_KEY,
+    VERSION_KEY, CatalogCacheMixin, bump_version, order_version_key, user_scoped_key
+)
+from .conditional import VersionETagMixin
+from .metrics import registry
+from .prometheus import render_metrics
 
-class CurrentUserView(APIView):
+class CurrentUserView(VersionETagMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_etag_versions(self):
+        return [user_scoped_key(USERS_VERSION_KEY, self.request.user.id)]
+
     def get(self, request):
-        try:
-            serializer = UserSerializer(request.user)
-            return Response(serializer.data)
-        except Exception:
+        # request.user is built from token claims; the profile needs the model
+        user = User.objects.select_related('profile').filter(pk=request.user.id).first()
+        if user is None:
             return Response({"detail": "User not found"}, status=404)
+        return Response(UserSerializer(user).data)
 
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = (permissions.AllowAny,)
     serializer_class = RegisterSerializer
 
-class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all()
+def catalog_products(request, queryset, listing):
+    """Products for the catalog endpoints; ``listing`` applies the list filters and ?q= search."""
+    if renders_field(request, ProductSerializer, 'category_details'):
+        queryset = queryset.select_related('category')
+    if not listing:
+        return queryset
+    queryset = filter_products(queryset, request.query_params.dict())
+    query = request.query_params.get('q', '').strip()
+    if query:
+        queryset = search_products(queryset, query)
+    return queryset
+
+class ProductViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
+    queryset = Product.objects.defer('search_vector')
     serializer_class = ProductSerializer
+    pagination_class = ProductCursorPagination
     lookup_field = 'slug'
 
+    def get_queryset(self):
+        return catalog_products(self.request, super().get_queryset(), listing=self.action == 'list')
+
+    def paginate_queryset(self, queryset):
+        self.facets = product_facets(queryset)
+        return super().paginate_queryset(queryset)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['facets'] = self.facets
+        return response
+
+    def get_last_modified(self):
+        if self.action == 'retrieve':
+            return self.get_object().updated_at
+        return self.get_queryset().aggregate(Max('updated_at'))['updated_at__max']
+
     def get_permissions(self):
         # Explicitly allow any access to list and retrieve
         if self.action in ['list', 'retrieve']:
             return [permissions.AllowAny()]
         return [permissions.IsAuthenticated()]
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(VersionETagMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by('-created_at')
+        return Order.objects.filter(user_id=self.request.user.id).with_items().order_by('-created_at')
+
+    def get_etag_versions(self):
+        return [order_version_key(self.request.user.id), PRODUCTS_VERSION_KEY]
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        serializer.save(user_id=self.request.user.id)
 
-class AddressViewSet(viewsets.ModelViewSet):
+class AddressViewSet(VersionETagMixin, viewsets.ModelViewSet):
     serializer_class = AddressSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Address.objects.filter(user=self.request.user)
+        return Address.objects.filter(user_id=self.request.user.id)
+
+    def get_etag_versions(self):
+        return [user_scoped_key(ADDRESSES_VERSION_KEY, self.request.user.id)]
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        serializer.save(user_id=self.request.user.id)
 
-class SavedItemViewSet(viewsets.ModelViewSet):
+class SavedItemViewSet(VersionETagMixin, viewsets.ModelViewSet):
     serializer_class = SavedItemSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return SavedItem.objects.filter(user=self.request.user)
+        queryset = SavedItem.objects.filter(user_id=self.request.user.id)
+        if renders_field(self.request, SavedItemSerializer, 'product_details'):
+            columns = [f'product__{column}' for column in ProductCardSerializer.COLUMNS]
+            queryset = queryset.select_related('product').only('id', 'user', 'product', 'created_at', *columns)
+        return queryset
+
+    def get_etag_versions(self):
+        return [user_scoped_key(SAVED_ITEMS_VERSION_KEY, self.request.user.id), PRODUCTS_VERSION_KEY]
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        serializer.save(user_id=self.request.user.id)
+
+    @action(detail=False, methods=['post', 'delete'])
+    def batch(self, request):
+        """Save or remove many products at once and return the resulting saved items."""
+        batch = SavedItemBatchSerializer(data=request.data)
+        batch.is_valid(raise_exception=True)
+        product_ids = batch.validated_data['product_ids']
 
-class ReviewViewSet(viewsets.ModelViewSet):
+        with transaction.atomic():
+            if request.method == 'POST':
+                # Already-saved products hit unique_together and are skipped
+                SavedItem.objects.bulk_create(
+                    [SavedItem(user_id=request.user.id, product_id=product_id) for product_id in product_ids],
+                    ignore_conflicts=True,
+                )
+                # bulk_create sends no post_save
+                bump_version(user_scoped_key(SAVED_ITEMS_VERSION_KEY, request.user.id))
+            else:
+                self.get_queryset().filter(product_id__in=product_ids).delete()
+
+        return Response(self.get_serializer(self.get_queryset(), many=True).data)
+
+class ReviewViewSet(VersionETagMixin, viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
+    pagination_class = CreatedAtCursorPagination
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     def get_queryset(self):
+        queryset = Review.objects.select_related('user__profile')
         product_id = self.request.query_params.get('product')
         if product_id:
-            return Review.objects.filter(product_id=product_id)
-        return Review.objects.all().order_by('-created_at')
+            return queryset.filter(product_id=product_id)
+        return queryset.order_by('-created_at')
 
+    def get_etag_versions(self):
+        # Review writes bump the catalog version; reviewer names and avatars the users'
+        return [VERSION_KEY, USERS_VERSION_KEY]
+
+    # Review writes and the Product rating refresh (update_product_rating
+    # signal) commit together.
+    @transaction.atomic
     def perform_create(self, serializer):
         product_id = self.request.data.get('product')
         product = Product.objects.get(id=product_id)
-        serializer.save(user=self.request.user, product=product)
+        serializer.save(user_id=self.request.user.id, product=product)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        serializer.save()
 
-class PurchasedProductsView(generics.ListAPIView):
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+
+class PurchasedProductsView(VersionETagMixin, generics.ListAPIView):
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_etag_versions(self):
+        return [order_version_key(self.request.user.id), VERSION_KEY]
+
     def get_queryset(self):
         # Products from delivered orders that haven't been reviewed yet?
         # For now, just all purchased products
         purchased_ids = OrderItem.objects.filter(
-            order__user=self.request.user
+            order__user_id=self.request.user.id
         ).values_list('product_id', flat=True).distinct()
 
-        return Product.objects.filter(id__in=purchased_ids)
+        queryset = Product.objects.filter(id__in=purchased_ids).defer('search_vector')
+        if renders_field(self.request, ProductSerializer, 'category_details'):
+            queryset = queryset.select_related('category')
+        return queryset
 
 # --- Admin Views ---
 
-class AdminUserViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = User.objects.all()
+class AdminUserViewSet(VersionETagMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = User.objects.select_related('profile')
     serializer_class = UserSerializer
+    pagination_class = UserCursorPagination
     permission_classes = [permissions.IsAdminUser]
 
-class AdminOrderViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Order.objects.all().order_by('-created_at')
+    def get_etag_versions(self):
+        return [USERS_VERSION_KEY]
+
+    @action(detail=False, renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        """Stream every matching customer as CSV or NDJSON (?format= or Accept)."""
+        filters = CustomerExportFilterSerializer(data=request.query_params.dict())
+        filters.is_valid(raise_exception=True)
+        data = filters.validated_data
+        queryset = User.objects.filter(**date_range_filter('date_joined', data.get('start'), data.get('end')))
+        if 'status' in data:
+            queryset = queryset.filter(is_active=data['status'] == 'active')
+        return export_response(customer_rows(queryset), CUSTOMER_COLUMNS, request.accepted_renderer.format, 'customers')
+
+class AdminOrderViewSet(VersionETagMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Order.objects.with_items().order_by('-created_at')
     serializer_class = OrderSerializer
+    pagination_class = CreatedAtCursorPagination
+    permission_classes = [permissions.IsAdminUser]
+
+    def get_etag_versions(self):
+        return [ORDERS_VERSION_KEY, PRODUCTS_VERSION_KEY]
+
+    @action(detail=False, renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        """Stream every matching order, with its items, as CSV or NDJSON (?format= or Accept)."""
+        filters = OrderExportFilterSerializer(data=request.query_params.dict())
+        filters.is_valid(raise_exception=True)
+        data = filters.validated_data
+        queryset = Order.objects.filter(**date_range_filter('created_at', data.get('start'), data.get('end')))
+        if 'status' in data:
+            queryset = queryset.filter(status=data['status'])
+        return export_response(order_rows(queryset), ORDER_COLUMNS, request.accepted_renderer.format, 'orders')
+
+class AdminProductImportView(APIView):
+    """Upsert products by slug from an uploaded .csv or .jsonl file (see core.product_import)."""
     permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        import_format = format_for(upload.name) if upload else None
+        if import_format is None:
+            raise ValidationError({'file': ['Upload a .csv, .jsonl or .ndjson file.']})
+        return Response(ProductImport().run(read_rows(open_text(upload.file), import_format)))
 
 class AdminAnalyticsView(APIView):
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request):
-        total_revenue = Order.objects.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-        total_orders = Order.objects.count()
-        total_customers = User.objects.count()
-        recent_orders = Order.objects.order_by('-created_at')[:5]
+        date_range = DateRangeSerializer(data=request.query_params.dict())
+        date_range.is_valid(raise_exception=True)
+
+        # Served from the daily rollups: cost scales with days, not orders
+        summary = analytics_summary(**date_range.validated_data)
+        recent_orders = Order.objects.with_items().order_by('-created_at')[:5]
+        summary['recent_orders'] = OrderSerializer(recent_orders, many=True).data
+
+        return Response(summary)
 
-        recent_orders_data = OrderSerializer(recent_orders, many=True).data
+class AdminMetricsView(APIView):
+    """Rolling per-view request metrics for this process (see core.middleware)."""
+    permission_classes = [permissions.IsAdminUser]
 
+    def get(self, request):
         return Response({
-            'total_revenue': total_revenue,
-            'total_orders': total_orders,
-            'total_customers': total_customers,
-            'recent_orders': recent_orders_data
-        })
\ No newline at end of file
+            'sample_rate': settings.REQUEST_METRICS_SAMPLE_RATE,
+            'window': settings.REQUEST_METRICS_WINDOW,
+            'views': registry.summary(),
+        })
+
+
+def prometheus_metrics(request):
+    """Prometheus text exposition, aggregated across gunicorn workers."""
+    if not settings.METRICS_TOKEN:
+        # Unprotected only in development; elsewhere a token must be configured
+        if not settings.DEBUG:
+            return HttpResponse(status=404)
+    elif not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}'):
+        return HttpResponse(status=401)
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
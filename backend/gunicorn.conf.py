@@ -0,0 +1,25 @@
+"""
+Gunicorn settings, picked up automatically from the working directory.
+
+Points prometheus_client at a per-deployment directory so every worker writes
+its metrics to files that /metrics aggregates, and cleans up after workers
+that exit.
+"""
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'nexus-prometheus'))
+
+
+def on_starting(server):
+    # Stale files from a previous run would be summed into the new one
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -2,6 +2,10 @@
 ASGI config for nexus_api project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests are routed by nexus_api.asgi_urls, which serves the catalog and
+account reads from async views. Run it with:
+
+    gunicorn nexus_api.asgi -k uvicorn_worker.UvicornWorker
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
@@ -9,8 +13,24 @@ https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nexus_api.settings')
+# Persistent connections don't outlive an async request; see Django's
+# "Persistent connections" notes for ASGI
+os.environ.setdefault('CONN_MAX_AGE', '0')
+
+ASGI_URLCONF = 'nexus_api.asgi_urls'
+
+
+class AsyncReadsASGIHandler(ASGIHandler):
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = ASGI_URLCONF
+        return request, error_response
+
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+application = AsyncReadsASGIHandler()
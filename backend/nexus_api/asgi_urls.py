@@ -0,0 +1,16 @@
+"""
+URLconf for the ASGI app: the read-heavy endpoints go to the async views in
+core.async_views, everything else to the same views as nexus_api.urls.
+"""
+from django.urls import path
+
+from core import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/products/', async_views.product_list, name='product-list'),
+    path('api/products/<slug:slug>/', async_views.product_detail, name='product-detail'),
+    path('api/categories/', async_views.category_list, name='category-list'),
+    path('api/reviews/', async_views.review_list, name='review-list'),
+    path('api/auth/users/me/', async_views.current_user, name='current-user'),
+] + sync_urlpatterns
@@ -4,7 +4,9 @@ from rest_framework.routers import DefaultRouter
 from core.views import (
     ProductViewSet, CategoryViewSet, OrderViewSet, AddressViewSet,
     ReviewViewSet, SavedItemViewSet, AdminUserViewSet, AdminOrderViewSet,
-    AdminAnalyticsView, CurrentUserView, PurchasedProductsView, RegisterView
+    AdminAnalyticsView, AdminMetricsView, AdminProductImportView, CurrentUserView,
+    PurchasedProductsView, RegisterView,
+    prometheus_metrics
 )
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -25,12 +27,15 @@ router.register(r'admin/orders', AdminOrderViewSet, basename='admin-orders')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', prometheus_metrics, name='prometheus-metrics'),
     path('api/', include(router.urls)),
     path('api/auth/register/', RegisterView.as_view(), name='register'),
     path('api/auth/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/auth/users/me/', CurrentUserView.as_view(), name='current-user'),
     path('api/admin/analytics/', AdminAnalyticsView.as_view(), name='admin-analytics'),
+    path('api/admin/metrics/', AdminMetricsView.as_view(), name='admin-metrics'),
+    path('api/admin/products/import/', AdminProductImportView.as_view(), name='admin-product-import'),
     path('api/purchased-products/', PurchasedProductsView.as_view(), name='purchased-products'),
     path('api/auth-browsable/', include('rest_framework.urls')),
 ]
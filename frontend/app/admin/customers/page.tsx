@@ -4,12 +4,22 @@ import { useEffect, useState } from 'react'
 import { apiClient } from '@/lib/api-client'
 import { User } from '@/lib/types'
 import { Mail, Shield } from 'lucide-react'
+import { Button } from '@/components/ui/button'
 
 export default function AdminCustomersPage() {
     const [customers, setCustomers] = useState<User[]>([])
+    const [next, setNext] = useState<string | null>(null)
+
+    // The list is paginated newest first: the first page replaces, "Load more" appends
+    const loadPage = (url: string, append = true) => {
+        apiClient.getPage<User>(url).then((page) => {
+            setCustomers((loaded) => append ? [...loaded, ...page.results] : page.results)
+            setNext(page.next)
+        })
+    }
 
     useEffect(() => {
-        apiClient.request<User[]>('/api/admin/customers/').then(setCustomers)
+        loadPage('/api/admin/customers/', false)
     }, [])
 
     return (
@@ -37,6 +47,12 @@ export default function AdminCustomersPage() {
                     </div>
                 ))}
             </div>
+
+            {next && (
+                <div className="flex justify-center">
+                    <Button variant="outline" onClick={() => loadPage(next)}>Load more</Button>
+                </div>
+            )}
         </div>
     )
 }
\ No newline at end of file
@@ -8,10 +8,18 @@ import { Button } from '@/components/ui/button'
 
 export default function AdminOrdersPage() {
   const [orders, setOrders] = useState<Order[]>([])
+  const [next, setNext] = useState<string | null>(null)
+
+  // The list is paginated newest first: the first page replaces, "Load more" appends
+  const loadPage = (url: string, append = true) => {
+    apiClient.getPage<Order>(url).then((page) => {
+      setOrders((loaded) => append ? [...loaded, ...page.results] : page.results)
+      setNext(page.next)
+    })
+  }
 
   useEffect(() => {
-    // Note: Admin endpoint should be used here in reality
-    apiClient.request<Order[]>('/api/admin/orders/').then(setOrders)
+    loadPage('/api/admin/orders/', false)
   }, [])
 
   return (
@@ -50,6 +58,12 @@ export default function AdminOrdersPage() {
             </tbody>
           </table>
         </div>
+
+        {next && (
+            <div className="flex justify-center">
+              <Button variant="outline" onClick={() => loadPage(next)}>Load more</Button>
+            </div>
+        )}
       </div>
   )
 }
\ No newline at end of file
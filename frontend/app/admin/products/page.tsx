@@ -13,7 +13,7 @@ export default function AdminProductsPage() {
   const [search, setSearch] = useState('')
 
   useEffect(() => {
-    apiClient.getProducts().then(setProducts)
+    apiClient.getAllProducts().then(setProducts)
   }, [])
 
   const filtered = products.filter(p => p.name.toLowerCase().includes(search.toLowerCase()))
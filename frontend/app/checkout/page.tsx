@@ -74,6 +74,7 @@ export default function CheckoutPage() {
         total_amount: total,
         status: "pending",
         shipping_address: `${formData.street}, ${formData.city}. Phone: ${formData.phone}. Note: ${formData.note}`,
+        shipping_city: formData.city,
         payment_method: paymentMethod,
         items: items.map(item => ({
           product_id: item.id,
@@ -61,7 +61,7 @@ export default function Home() {
                     Shop Now
                   </Button>
                 </Link>
-                <Link href="/search?category=Offers">
+                <Link href="/search?featured=true">
                   <Button variant="outline" size="lg" className="text-white border-white hover:bg-white/10 rounded-full px-8 bg-transparent">
                     View Offers
                   </Button>
@@ -127,7 +127,7 @@ export default function Home() {
               {categories.map((category) => (
                   <Link
                       key={category.id}
-                      href={`/search?category=${category.name}`}
+                      href={`/search?category=${category.slug}`}
                       className="bg-white p-6 rounded-xl border border-gray-200 hover:border-[#1E3A8A] hover:shadow-md transition text-center group"
                   >
                     <div className="w-12 h-12 bg-gray-100 rounded-full mx-auto mb-3 flex items-center justify-center group-hover:bg-blue-50 transition">
@@ -53,11 +53,11 @@ function FilterContent({
             {categories.map((cat: Category) => (
                 <div key={cat.id} className="flex items-center gap-2">
                   <Checkbox
-                      id={cat.name}
-                      checked={selectedCategory === cat.name}
-                      onCheckedChange={() => onCategoryChange(cat.name)}
+                      id={cat.slug}
+                      checked={selectedCategory === cat.slug}
+                      onCheckedChange={() => onCategoryChange(cat.slug)}
                   />
-                  <label htmlFor={cat.name} className="text-sm cursor-pointer">
+                  <label htmlFor={cat.slug} className="text-sm cursor-pointer">
                     {cat.name}
                   </label>
                 </div>
@@ -82,6 +82,8 @@ export default function SearchPage() {
 
   const query = searchParams.get('q') || ''
   const category = searchParams.get('category') || ''
+  // Offers/deals links: featured products
+  const featured = searchParams.get('featured') === 'true'
 
   const [products, setProducts] = useState<Product[]>([])
   const [categories, setCategories] = useState<Category[]>([])
@@ -98,19 +100,18 @@ export default function SearchPage() {
     const fetchResults = async () => {
       setLoading(true)
 
-      // FIXED: Pass an object, not a URLSearchParams string
-      const searchParamsObj: { search?: string; category?: string } = {}
-      if (query) searchParamsObj.search = query
-      // Note: If your backend filters category via a separate field, use that key.
-      // Assuming 'category' is filtered via search param or a specific 'category' param
+      // q: ranked full-text search; category: a category slug (names also match)
+      const searchParamsObj: { q?: string; category?: string; is_featured?: boolean } = {}
+      if (query) searchParamsObj.q = query
       if (category) searchParamsObj.category = category
+      if (featured) searchParamsObj.is_featured = true
 
       const data = await getProducts(searchParamsObj)
       setProducts(data)
       setLoading(false)
     }
     fetchResults()
-  }, [query, category])
+  }, [query, category, featured])
 
   const filteredProducts = products.filter(p => {
     const price = Number(p.price)
@@ -127,16 +128,18 @@ export default function SearchPage() {
     router.push('/search')
   }
 
-  const handleCategoryChange = (catName: string) => {
-    router.push(`/search?category=${catName}`)
+  const handleCategoryChange = (slug: string) => {
+    router.push(`/search?category=${encodeURIComponent(slug)}`)
   }
 
+  const categoryName = categories.find((cat) => cat.slug === category)?.name ?? category
+
   return (
       <div className="min-h-screen bg-gray-50">
         <div className="max-w-7xl mx-auto px-4 sm:px-6 lg:px-8 py-8">
           <div className="mb-8">
             <h1 className="text-3xl font-bold text-[#1E3A8A] mb-2">
-              {query ? `Search Results for "${query}"` : category ? `${category}` : 'All Products'}
+              {query ? `Search Results for "${query}"` : category ? categoryName : featured ? 'Offers' : 'All Products'}
             </h1>
             <p className="text-gray-600">{filteredProducts.length} products found</p>
           </div>
@@ -28,9 +28,9 @@ export default function Footer() {
               <h4 className="text-white font-semibold mb-4">SHOP</h4>
               <ul className="space-y-2 text-sm">
                 <li><Link href="/search?category=laptops" className="hover:text-white transition">Laptops</Link></li>
-                <li><Link href="/search?category=smartphones" className="hover:text-white transition">Smartphones</Link></li>
+                <li><Link href="/search?category=phones" className="hover:text-white transition">Smartphones</Link></li>
                 <li><Link href="/search?category=accessories" className="hover:text-white transition">Accessories</Link></li>
-                <li><Link href="/search?category=deals" className="hover:text-white transition">Deals</Link></li>
+                <li><Link href="/search?featured=true" className="hover:text-white transition">Deals</Link></li>
               </ul>
             </div>
 
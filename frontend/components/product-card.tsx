@@ -14,6 +14,15 @@ const getImageUrl = (imagePath: string | null) => {
   return `${apiUrl}${imagePath}`;
 };
 
+// "url 200w, url 400w" from the API, with relative media URLs made absolute
+const getSrcSet = (srcset?: string) =>
+  srcset
+    ?.split(", ")
+    .map((candidate) => getImageUrl(candidate))
+    .join(", ");
+
+const IMAGE_SIZES = "(max-width: 768px) 100vw, (max-width: 1200px) 50vw, 33vw";
+
 interface ProductCardProps {
   product: Product
 }
@@ -26,13 +35,31 @@ export function ProductCard({ product }: ProductCardProps) {
     <Card className="overflow-hidden flex flex-col h-full group transition-all duration-300 hover:shadow-lg border-border/50">
       <div className="relative aspect-square overflow-hidden bg-secondary/20">
         <Link href={`/product/${product.slug}`}>
-          <Image
-            src={imageUrl}
-            alt={product.name}
-            fill
-            className="object-cover transition-transform duration-500 group-hover:scale-105"
-            sizes="(max-width: 768px) 100vw, (max-width: 1200px) 50vw, 33vw"
-          />
+          {product.image_srcset?.jpeg ? (
+            // Resized copies from the API, so the card never downloads the original upload
+            <picture>
+              {product.image_srcset.webp && (
+                <source type="image/webp" srcSet={getSrcSet(product.image_srcset.webp)} sizes={IMAGE_SIZES} />
+              )}
+              <img
+                src={imageUrl}
+                srcSet={getSrcSet(product.image_srcset.jpeg)}
+                sizes={IMAGE_SIZES}
+                alt={product.name}
+                loading="lazy"
+                decoding="async"
+                className="absolute inset-0 h-full w-full object-cover transition-transform duration-500 group-hover:scale-105"
+              />
+            </picture>
+          ) : (
+            <Image
+              src={imageUrl}
+              alt={product.name}
+              fill
+              className="object-cover transition-transform duration-500 group-hover:scale-105"
+              sizes={IMAGE_SIZES}
+            />
+          )}
         </Link>
         {product.is_new && (
           <span className="absolute top-2 left-2 bg-primary text-primary-foreground text-xs font-bold px-2 py-1 rounded-full z-10">
@@ -1,4 +1,4 @@
-import { Product, Order, User, Category, Address } from './types'
+import { Product, Order, User, Category, Address, Paginated } from './types'
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://127.0.0.1:8000'
 
@@ -6,6 +6,32 @@ interface RequestOptions extends RequestInit {
   params?: Record<string, string | number | boolean | undefined>
 }
 
+// Access tokens are short-lived; trade the refresh token for a new one.
+// Concurrent 401s share a single refresh request.
+let pendingRefresh: Promise<string | null> | null = null
+
+export function refreshAccessToken(): Promise<string | null> {
+  if (typeof window === 'undefined') return Promise.resolve(null)
+  const refresh = localStorage.getItem('refreshToken')
+  if (!refresh) return Promise.resolve(null)
+
+  pendingRefresh ??= fetch(`${API_BASE_URL}/api/auth/token/refresh/`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ refresh }),
+  })
+    .then(async (response) => {
+      if (!response.ok) return null
+      const { access } = await response.json()
+      localStorage.setItem('accessToken', access)
+      return access as string
+    })
+    .catch(() => null)
+    .finally(() => { pendingRefresh = null })
+
+  return pendingRefresh
+}
+
 class ApiClient {
   private getHeaders(): HeadersInit {
     const headers: HeadersInit = {
@@ -21,6 +47,9 @@ class ApiClient {
   }
 
   private buildUrl(endpoint: string, params?: Record<string, string | number | boolean | undefined>): string {
+    // A paginated response's next/previous link is already a full URL
+    if (/^https?:\/\//.test(endpoint)) return endpoint
+
     // Ensure endpoint doesn't start with / if we are appending to base
     const cleanEndpoint = endpoint.startsWith('/') ? endpoint : `/${endpoint}`
 
@@ -45,15 +74,19 @@ class ApiClient {
   async request<T>(endpoint: string, options: RequestOptions = {}): Promise<T> {
     const { params, ...requestInit } = options
     const url = this.buildUrl(endpoint, params)
+    const send = () => fetch(url, {
+      ...requestInit,
+      headers: {
+        ...this.getHeaders(),
+        ...(requestInit.headers || {}),
+      },
+    })
 
     try {
-      const response = await fetch(url, {
-        ...requestInit,
-        headers: {
-          ...this.getHeaders(),
-          ...(requestInit.headers || {}),
-        },
-      })
+      let response = await send()
+      if (response.status === 401 && await refreshAccessToken()) {
+        response = await send()
+      }
 
       if (response.status === 204) return {} as T
 
@@ -72,7 +105,7 @@ class ApiClient {
         throw new Error(errorMsg)
       }
 
-      return data.results ? data.results : data
+      return data
     } catch (error) {
       console.error('[API Error]', endpoint, error)
       throw error
@@ -93,6 +126,23 @@ class ApiClient {
     })
   }
 
+  // One page of a paginated list; pass the previous page's `next` to continue
+  async getPage<T>(endpoint: string, params?: Record<string, string | number | boolean>): Promise<Paginated<T>> {
+    return this.request(endpoint, { params })
+  }
+
+  // Every page of a paginated list, following `next`
+  async getAllPages<T>(endpoint: string, params?: Record<string, string | number | boolean>): Promise<T[]> {
+    const results: T[] = []
+    let page = await this.getPage<T>(endpoint, { page_size: 100, ...params })
+    results.push(...page.results)
+    while (page.next) {
+      page = await this.getPage<T>(page.next)
+      results.push(...page.results)
+    }
+    return results
+  }
+
   async logout(): Promise<void> {
     if (typeof window !== 'undefined') {
       localStorage.removeItem('accessToken')
@@ -108,8 +158,13 @@ class ApiClient {
     return this.request('/api/categories')
   }
 
+  // The first page (newest first)
   async getProducts(params?: Record<string, string | number | boolean>): Promise<Product[]> {
-    return this.request('/api/products', { params })
+    return (await this.getPage<Product>('/api/products', params)).results
+  }
+
+  async getAllProducts(params?: Record<string, string | number | boolean>): Promise<Product[]> {
+    return this.getAllPages('/api/products', params)
   }
 
   async getProduct(slug: string): Promise<Product> {
@@ -156,13 +211,11 @@ class ApiClient {
 
   // FIX: Pass product ID as a param, not part of the string
   async getReviews(productId: string | number): Promise<any[]> {
-    return this.request('/api/reviews', {
-      params: { product: productId }
-    })
+    return this.getAllPages('/api/reviews', { product: productId })
   }
 
   async getAllReviews(): Promise<any[]> {
-    return this.request('/api/reviews')
+    return this.getAllPages('/api/reviews')
   }
 
   async createReview(productId: string | number, rating: number, comment: string): Promise<any> {
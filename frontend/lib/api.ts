@@ -1,5 +1,6 @@
 import axios, { InternalAxiosRequestConfig } from 'axios'
 import { Product, Category, OrderPayload, LoginCredentials, RegisterData } from '@/lib/types'
+import { refreshAccessToken } from '@/lib/api-client'
 
 // 1. Setup Axios Instance
 export const api = axios.create({
@@ -26,12 +27,29 @@ api.interceptors.request.use(
     (error) => Promise.reject(error)
 )
 
+// Retry once with a fresh access token when the short-lived one has expired
+api.interceptors.response.use(
+    (response) => response,
+    async (error) => {
+        const config = error.config
+        if (error.response?.status === 401 && config && !config._retried) {
+            config._retried = true
+            const token = await refreshAccessToken()
+            if (token) {
+                config.headers.Authorization = `Bearer ${token}`
+                return api(config)
+            }
+        }
+        return Promise.reject(error)
+    }
+)
+
 // 3. API Methods
 
-export const getProducts = async (params?: { category?: string; search?: string }): Promise<Product[]> => {
+export const getProducts = async (params?: { category?: string; q?: string; is_featured?: boolean }): Promise<Product[]> => {
     try {
         const response = await api.get('/products/', { params })
-        return response.data
+        return response.data.results ?? response.data
     } catch (error) {
         console.error('Error fetching products:', error)
         return []
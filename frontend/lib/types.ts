@@ -1,8 +1,15 @@
+// Resized copies of an image by format: "url 200w, url 400w, url 800w"
+export interface ImageSrcSet {
+  webp?: string
+  jpeg?: string
+}
+
 export interface Category {
   id: string | number
   name: string
   slug: string
   image?: string
+  image_srcset?: ImageSrcSet
 }
 
 export interface User {
@@ -13,6 +20,7 @@ export interface User {
   last_name?: string
   phone?: string
   avatar?: string
+  avatar_srcset?: ImageSrcSet | null
   membershipTier?: 'standard' | 'gold' | 'platinum'
   walletBalance?: number
   created_at?: string
@@ -38,6 +46,7 @@ export interface Product {
   sku?: string
   stock: number
   image: string
+  image_srcset?: ImageSrcSet
   is_featured: boolean
   rating?: number
   reviewCount?: number
@@ -93,6 +102,7 @@ export interface OrderPayload {
   total_amount: number
   status?: string
   shipping_address: string
+  shipping_city?: string
   payment_method: string
   items: {
     product_id: string | number
@@ -101,6 +111,13 @@ export interface OrderPayload {
   }[]
 }
 
+// A cursor-paginated list response (products, reviews, admin orders and customers)
+export interface Paginated<T> {
+  next: string | null
+  previous: string | null
+  results: T[]
+}
+
 export interface Review {
   id: string | number
   user_name?: string